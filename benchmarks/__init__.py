@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Load and performance measurements, run against local stand-in providers (see stubs/).
@@ -0,0 +1,117 @@
+# benchmarks/codec_benchmark.py
+"""
+Compare the in-process NumPy codec with the pydub/ffmpeg path it replaces.
+
+Every case converts one synthetic utterance and reports the mean time per
+utterance. The pydub cases need pydub and an ffmpeg binary on the PATH and
+are skipped without them.
+
+    python -m benchmarks.codec_benchmark --seconds 3 --repeat 20
+"""
+
+import argparse
+import io
+import shutil
+import time
+
+import numpy as np
+
+from voice_assistant.codec import (TWILIO_SAMPLE_RATE, pcm16_to_ulaw, ulaw_to_pcm16, resample, pcm16_to_wav,
+                                   iter_frames)
+
+STT_SAMPLE_RATE = 16000
+TTS_SAMPLE_RATE = 22050
+
+
+def synthetic_speech(seconds, sample_rate):
+    """
+    Return a speech-like test signal: a few harmonics with a syllable-rate envelope, plus noise.
+    """
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    voice = sum(np.sin(2 * np.pi * 140 * harmonic * t) / harmonic for harmonic in range(1, 8))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+    noise = np.random.default_rng(0).normal(0, 0.02, len(t))
+    return (np.clip(voice * envelope / 3 + noise, -1, 1) * 20000).astype(np.int16)
+
+
+def codec_inbound(ulaw):
+    pcm = resample(ulaw_to_pcm16(ulaw), TWILIO_SAMPLE_RATE, STT_SAMPLE_RATE)
+    return pcm16_to_wav(pcm, STT_SAMPLE_RATE)
+
+
+def codec_outbound(pcm):
+    ulaw = pcm16_to_ulaw(resample(pcm, TTS_SAMPLE_RATE, TWILIO_SAMPLE_RATE))
+    return list(iter_frames(ulaw))
+
+
+def pydub_inbound(ulaw):
+    from pydub import AudioSegment
+    segment = AudioSegment.from_file(io.BytesIO(ulaw), format="mulaw")
+    return segment.set_frame_rate(STT_SAMPLE_RATE).export(io.BytesIO(), format="wav").getvalue()
+
+
+def pydub_outbound(pcm):
+    from pydub import AudioSegment
+    segment = AudioSegment(pcm.tobytes(), sample_width=2, frame_rate=TTS_SAMPLE_RATE, channels=1)
+    ulaw = segment.set_frame_rate(TWILIO_SAMPLE_RATE).export(io.BytesIO(), format="mulaw").getvalue()
+    return [ulaw[offset:offset + 160] for offset in range(0, len(ulaw), 160)]
+
+
+def time_case(func, data, repeat):
+    func(data)  # warm-up: imports, filter design
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(data)
+    return (time.perf_counter() - started) / repeat
+
+
+def pydub_available():
+    try:
+        import pydub  # noqa: F401
+    except ImportError:
+        return False
+    return shutil.which("ffmpeg") is not None
+
+
+def run_benchmark(seconds, repeat):
+    """
+    Time both paths for each conversion.
+
+    Returns:
+        list: Dicts with the case name and seconds per utterance for ``codec`` and ``pydub`` (None if skipped).
+    """
+    ulaw = pcm16_to_ulaw(synthetic_speech(seconds, TWILIO_SAMPLE_RATE))
+    pcm = synthetic_speech(seconds, TTS_SAMPLE_RATE)
+    with_pydub = pydub_available()
+    cases = [
+        ("mu-law 8 kHz -> PCM16 16 kHz WAV (STT)", codec_inbound, pydub_inbound, ulaw),
+        ("PCM16 22.05 kHz -> mu-law 8 kHz frames (Twilio)", codec_outbound, pydub_outbound, pcm),
+    ]
+    return [{
+        "case": name,
+        "codec": time_case(codec_func, data, repeat),
+        "pydub": time_case(pydub_func, data, repeat) if with_pydub else None,
+    } for name, codec_func, pydub_func, data in cases]
+
+
+def print_report(results, seconds):
+    print(f"Per {seconds:g} s utterance:")
+    for result in results:
+        line = f"  {result['case']:<50} codec {result['codec'] * 1000:8.2f} ms"
+        if result["pydub"] is not None:
+            line += f"   pydub {result['pydub'] * 1000:8.2f} ms   {result['pydub'] / result['codec']:6.1f}x"
+        else:
+            line += "   pydub skipped (needs pydub and ffmpeg)"
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the NumPy codec against pydub/ffmpeg.")
+    parser.add_argument("--seconds", type=float, default=3.0, help="length of the test utterance")
+    parser.add_argument("--repeat", type=int, default=20, help="conversions timed per case")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print_report(run_benchmark(args.seconds, args.repeat), args.seconds)
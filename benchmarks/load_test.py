@@ -0,0 +1,345 @@
+# benchmarks/load_test.py
+"""
+Simulate concurrent Twilio calls against the /media-stream WebSocket.
+
+Each simulated call sends Twilio ``start``/``media``/``stop`` events with
+20 ms mu-law frames at real-time pacing. It waits for the intro to finish
+and then speaks a number of turns. The latency of a turn is the time from
+the last frame of caller speech to the first frame of the reply. Twilio
+``mark`` events are echoed back once their audio would have been played.
+
+Run the app against the stand-in providers, then point this at it:
+
+    python -m stubs.stt_server &
+    python -m stubs.llm_server &
+    python -m stubs.tts_server &
+    STREAMING_TRANSCRIPTION_MODEL=deepgram DEEPGRAM_API_KEY=stub DEEPGRAM_LIVE_URL=ws://127.0.0.1:8766 \\
+    RESPONSE_MODEL=openai OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8767/v1 \\
+    CARTESIA_API_KEY=stub CARTESIA_TTS_WEBSOCKET_URL=ws://127.0.0.1:8768 \\
+    python server.py --workers 1
+    python -m benchmarks.load_test --calls 50 --server-pid <server pid>
+
+Event-loop lag is read from the server's /metrics. CPU and RSS per call
+are sampled from ``--server-pid`` when it is given.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import re
+import time
+import wave
+
+import numpy as np
+import requests
+import websockets
+
+from voice_assistant.codec import TWILIO_SAMPLE_RATE, pcm16_to_ulaw
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+FRAME_MS = 20
+FRAME_BYTES = TWILIO_SAMPLE_RATE * FRAME_MS // 1000
+_SILENT_FRAME = b"\xff" * FRAME_BYTES
+
+
+def synthetic_utterance(seconds=1.2, sample_rate=TWILIO_SAMPLE_RATE):
+    """
+    Build a speech-like test utterance: a syllable-rate modulated harmonic tone.
+
+    Returns:
+        bytes: The mu-law audio.
+    """
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    voice = sum(np.sin(2 * np.pi * 140 * harmonic * t) / harmonic for harmonic in range(1, 6))
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)
+    return pcm16_to_ulaw((voice * envelope * 4000).astype(np.int16))
+
+
+def load_utterance(path):
+    """
+    Load recorded caller audio: a mono 16-bit 8 kHz WAV file, or raw mu-law.
+
+    Returns:
+        bytes: The mu-law audio.
+    """
+    if not path.lower().endswith(".wav"):
+        with open(path, "rb") as audio_file:
+            return audio_file.read()
+    with wave.open(path, "rb") as wav_file:
+        if (wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate()) != (1, 2, TWILIO_SAMPLE_RATE):
+            raise ValueError("WAV input must be mono, 16-bit, 8 kHz")
+        return pcm16_to_ulaw(np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype="<i2"))
+
+
+class SimulatedCall:
+    """
+    One fake Twilio media stream.
+    """
+
+    def __init__(self, index, url, utterance, args):
+        self.stream_sid = f"MZload{index:05d}"
+        self.url = url
+        self.utterance = utterance
+        self.args = args
+        self.latencies = []
+        self.failed_turns = 0
+        self.max_send_delay = 0.0
+        self.error = None
+        self.ws = None
+        self.reply_started = None  # when the first reply frame of the current turn arrived
+        self.last_audio_at = 0.0
+        self.playback_clock = 0.0  # when the audio received so far finishes playing
+        self.pending_marks = []
+        self.next_frame_at = None
+
+    async def run(self):
+        try:
+            async with websockets.connect(self.url, max_size=None) as ws:
+                self.ws = ws
+                await self.send_event({"event": "connected", "protocol": "Call", "version": "1.0.0"})
+                await self.send_event({"event": "start", "streamSid": self.stream_sid, "start": {
+                    "streamSid": self.stream_sid, "callSid": f"CA{self.stream_sid}",
+                    "tracks": ["inbound"],
+                    "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": TWILIO_SAMPLE_RATE, "channels": 1},
+                }})
+                receiver = asyncio.create_task(self.receive())
+                try:
+                    await self.converse()
+                    await self.send_event({"event": "stop", "streamSid": self.stream_sid})
+                finally:
+                    receiver.cancel()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+
+    async def send_event(self, event):
+        await self.ws.send(json.dumps(event))
+
+    async def receive(self):
+        loop = asyncio.get_running_loop()
+        async for message in self.ws:
+            data = json.loads(message)
+            now = loop.time()
+            if data["event"] == "media":
+                if self.reply_started is None:
+                    self.reply_started = now
+                self.last_audio_at = now
+                audio_seconds = len(base64.b64decode(data["media"]["payload"])) / TWILIO_SAMPLE_RATE
+                self.playback_clock = max(self.playback_clock, now) + audio_seconds
+            elif data["event"] == "mark":
+                self.pending_marks.append((self.playback_clock, data["mark"]["name"]))
+            elif data["event"] == "clear":
+                # Twilio drops the buffered audio and echoes its marks right away
+                self.playback_clock = now
+                self.pending_marks = [(now, name) for _, name in self.pending_marks]
+
+    async def converse(self):
+        loop = asyncio.get_running_loop()
+        self.next_frame_at = loop.time()
+
+        # Wait for the intro to play out
+        await self.wait_for_reply(self.args.turn_timeout)
+        for _ in range(self.args.turns):
+            await self.send_silence(self.args.pause)
+            self.reply_started = None
+            for start in range(0, len(self.utterance), FRAME_BYTES):
+                await self.send_frame(self.utterance[start:start + FRAME_BYTES].ljust(FRAME_BYTES, b"\xff"))
+            speech_ended = loop.time()
+            if await self.wait_for_reply(self.args.turn_timeout):
+                self.latencies.append(self.reply_started - speech_ended)
+            else:
+                self.failed_turns += 1
+
+    async def wait_for_reply(self, timeout):
+        """
+        Stream silence until a reply has started and finished playing, or ``timeout`` passes.
+
+        Returns:
+            bool: True if a reply arrived.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            await self.send_frame(_SILENT_FRAME)
+            now = loop.time()
+            if (self.reply_started is not None and now >= self.playback_clock
+                    and now - self.last_audio_at >= self.args.reply_quiet):
+                return True
+        return self.reply_started is not None
+
+    async def send_silence(self, seconds):
+        for _ in range(int(seconds * 1000 / FRAME_MS)):
+            await self.send_frame(_SILENT_FRAME)
+
+    async def send_frame(self, frame):
+        loop = asyncio.get_running_loop()
+        self.next_frame_at += FRAME_MS / 1000
+        delay = self.next_frame_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            self.max_send_delay = max(self.max_send_delay, -delay)
+        await self.send_event({"event": "media", "streamSid": self.stream_sid,
+                               "media": {"payload": base64.b64encode(frame).decode("ascii")}})
+        await self.flush_marks()
+
+    async def flush_marks(self):
+        now = asyncio.get_running_loop().time()
+        while self.pending_marks and self.pending_marks[0][0] <= now:
+            _, name = self.pending_marks.pop(0)
+            await self.send_event({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": name}})
+
+
+def scrape_histogram(metrics_url, name):
+    """
+    Read the cumulative buckets of an unlabelled histogram from a /metrics page.
+
+    Returns:
+        list: (upper bound, cumulative count) pairs, or an empty list if unavailable.
+    """
+    try:
+        text = requests.get(metrics_url, timeout=5).text
+    except requests.RequestException as e:
+        logging.warning(f"Failed to scrape {metrics_url}: {e}")
+        return []
+    pattern = re.compile(rf'^{name}_bucket\{{le="([^"]+)"\}} (\S+)$', re.MULTILINE)
+    return [(float(bound), float(count)) for bound, count in pattern.findall(text)]
+
+
+def histogram_quantile(before, after, quantile):
+    """
+    Estimate a quantile of the observations made between two scrapes of a histogram.
+
+    Returns:
+        float | None: The upper bound of the bucket holding the quantile.
+    """
+    if not after:
+        return None
+    earlier = dict(before)
+    counts = [(bound, count - earlier.get(bound, 0.0)) for bound, count in after]
+    total = counts[-1][1]
+    if total <= 0:
+        return None
+    for bound, count in counts:
+        if count >= quantile * total:
+            return bound
+    return counts[-1][0]
+
+
+class ProcessSampler:
+    """
+    Samples CPU time and RSS of the server process while the test runs.
+    """
+
+    def __init__(self, pid, interval=1.0):
+        import psutil
+
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.baseline_rss = self.process.memory_info().rss
+        self.peak_rss = self.baseline_rss
+        self.cpu_start = None
+        self.started = None
+
+    async def run(self):
+        times = self.process.cpu_times()
+        self.cpu_start = times.user + times.system
+        self.started = time.monotonic()
+        while True:
+            await asyncio.sleep(self.interval)
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+
+    def cpu_cores(self):
+        times = self.process.cpu_times()
+        return (times.user + times.system - self.cpu_start) / (time.monotonic() - self.started)
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+async def run_load_test(args):
+    utterance = load_utterance(args.audio) if args.audio else synthetic_utterance()
+    sampler = None
+    if args.server_pid:
+        try:
+            sampler = ProcessSampler(args.server_pid)
+        except ImportError:
+            logging.warning("psutil is not installed (pip install psutil); skipping server CPU/RSS sampling.")
+    lag_before = scrape_histogram(args.metrics_url, "voice_event_loop_lag_seconds")
+
+    sampler_task = asyncio.create_task(sampler.run()) if sampler else None
+    calls = [SimulatedCall(index, args.url, utterance, args) for index in range(args.calls)]
+    started = time.monotonic()
+    tasks = []
+    for call in calls:
+        tasks.append(asyncio.create_task(call.run()))
+        # Ramp up so the calls don't all start on the same frame boundary
+        await asyncio.sleep(args.ramp_up / max(1, args.calls))
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+    if sampler_task:
+        sampler_task.cancel()
+
+    lag_after = scrape_histogram(args.metrics_url, "voice_event_loop_lag_seconds")
+    latencies = [latency for call in calls for latency in call.latencies]
+    report = {
+        "calls": args.calls,
+        "failed_calls": sum(1 for call in calls if call.error),
+        "turns": len(latencies),
+        "failed_turns": sum(call.failed_turns for call in calls),
+        "duration_s": round(elapsed, 1),
+        "turn_latency_s": {f"p{q}": percentile(latencies, q) for q in (50, 95, 99)},
+        "client_max_send_delay_s": max((call.max_send_delay for call in calls), default=0.0),
+        "server_loop_lag_s": {f"p{q}": histogram_quantile(lag_before, lag_after, q / 100) for q in (50, 99)},
+    }
+    if sampler:
+        report["server_cpu_cores_per_call"] = sampler.cpu_cores() / args.calls
+        report["server_rss_mb_per_call"] = (sampler.peak_rss - sampler.baseline_rss) / args.calls / 2**20
+    errors = sorted({call.error for call in calls if call.error})
+    if errors:
+        report["errors"] = errors
+    return report
+
+
+def print_report(report):
+    print(f"Calls: {report['calls']} ({report['failed_calls']} failed), "
+          f"turns: {report['turns']} ({report['failed_turns']} without reply), {report['duration_s']} s")
+    for name in ("turn_latency_s", "server_loop_lag_s"):
+        values = ", ".join(f"{q} {v * 1000:.0f} ms" if v is not None else f"{q} n/a" for q, v in report[name].items())
+        print(f"{name}: {values}")
+    print(f"client_max_send_delay: {report['client_max_send_delay_s'] * 1000:.0f} ms "
+          "(large values mean the load generator itself is overloaded)")
+    if "server_cpu_cores_per_call" in report:
+        print(f"server per call: {report['server_cpu_cores_per_call'] * 100:.2f}% of a core, "
+              f"{report['server_rss_mb_per_call']:.2f} MB RSS")
+    for error in report.get("errors", []):
+        print(f"error: {error}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Twilio media stream endpoint.")
+    parser.add_argument("--url", default="ws://127.0.0.1:5050/media-stream")
+    parser.add_argument("--metrics-url", default="http://127.0.0.1:5050/metrics")
+    parser.add_argument("--calls", type=int, default=10, help="concurrent simulated calls")
+    parser.add_argument("--turns", type=int, default=3, help="caller turns per call")
+    parser.add_argument("--audio", help="caller utterance: mono 16-bit 8 kHz WAV or raw mu-law")
+    parser.add_argument("--pause", type=float, default=0.5, help="seconds of silence before each turn")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which calls are started")
+    parser.add_argument("--turn-timeout", type=float, default=15.0)
+    parser.add_argument("--reply-quiet", type=float, default=0.5,
+                        help="seconds without reply audio after which a reply counts as finished")
+    parser.add_argument("--server-pid", type=int, help="sample CPU and RSS of this process")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(run_load_test(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
@@ -1,28 +1,433 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import faiss
+from pypdf import PdfReader
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+
+from voice_assistant.config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows; the atomic rename in _save_index still keeps indexes whole
+    fcntl = None
+
+# Vector stores already loaded by this process, by index key
+_loaded_indexes = {}
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as pdf_file:
+        for block in iter(lambda: pdf_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_key(pdf_path, chunk_size=Config.PDF_CHUNK_SIZE, chunk_overlap=Config.PDF_CHUNK_OVERLAP,
+              embedding_model=Config.PDF_EMBEDDING_MODEL):
+    """
+    Identify the index of a document: its content plus every setting that shapes the vectors.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        chunk_size (int): Characters per chunk.
+        chunk_overlap (int): Characters shared by neighbouring chunks.
+        embedding_model (str): The embedding model.
+
+    Returns:
+        str: A hex digest naming the index on disk.
+    """
+    settings = json.dumps({
+        "content": _file_digest(pdf_path),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embedding_model": embedding_model,
+    }, sort_keys=True)
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+
+def cached_embeddings(embedding_model=Config.PDF_EMBEDDING_MODEL, cache_dir=Config.PDF_INDEX_DIR):
+    """
+    Return embeddings that store every chunk's vector on disk, keyed by the chunk text.
+
+    An edited document shares most of its chunks with the previous version,
+    so only the changed chunks are sent to the embedding API.
+    """
+    return CacheBackedEmbeddings.from_bytes_store(
+        GoogleGenerativeAIEmbeddings(model=embedding_model),
+        LocalFileStore(os.path.join(cache_dir, "embeddings")),
+        namespace=embedding_model,
+    )
+
+
+def _load_index(index_dir, embeddings):
+    # Map the vectors instead of reading them into memory where FAISS supports it
+    index_path = os.path.join(index_dir, "index.faiss")
+    try:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        index = faiss.read_index(index_path)
+    # Written by _save_index in this cache directory, never taken from elsewhere
+    with open(os.path.join(index_dir, "index.pkl"), "rb") as docstore_file:
+        docstore, index_to_docstore_id = pickle.load(docstore_file)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def _save_index(vectors, index_dir):
+    # Write next to the final location, then rename, so readers never see half an index
+    parent = os.path.dirname(index_dir)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix=".staging-")
+    try:
+        vectors.save_local(staging)
+        os.replace(staging, index_dir)
+    except OSError:
+        # Another process saved the same index first
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def _index_lock(index_dir):
+    # Held while an index is built and saved, so processes starting together build it once
+    os.makedirs(os.path.dirname(index_dir), exist_ok=True)
+    with open(f"{index_dir}.lock", "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
 
 def process_pdf(pdf_path):
     """
     Extracts text from the uploaded PDF and creates a FAISS vector store.
-    
+
+    The index is persisted under ``Config.PDF_INDEX_DIR``, keyed by the PDF
+    content and the splitter and embedding settings, so an unchanged
+    document is never parsed or embedded twice.
+
     Args:
         pdf_path (str): Path to the uploaded PDF file.
 
     Returns:
         retriever: FAISS retriever for querying the document.
     """
-    loader = PyPDFLoader(pdf_path)
-    docs = loader.load()
+    key = index_key(pdf_path)
+    vectors = _loaded_indexes.get(key)
+    if vectors is not None:
+        return vectors.as_retriever(search_kwargs={"k": Config.PDF_RETRIEVER_K})
+
+    embeddings = cached_embeddings()
+    index_dir = os.path.join(Config.PDF_INDEX_DIR, "indexes", key)
+    if os.path.isdir(index_dir):
+        logging.info(f"Loading cached index for {pdf_path}")
+        vectors = _load_index(index_dir, embeddings)
+    else:
+        loader = PyPDFLoader(pdf_path)
+        docs = loader.load()
+
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=Config.PDF_CHUNK_SIZE,
+                                                       chunk_overlap=Config.PDF_CHUNK_OVERLAP)
+        final_documents = text_splitter.split_documents(docs)
+
+        texts = [doc.page_content for doc in final_documents]
+
+        # Generate embeddings; chunks seen before come from the embedding cache
+        vectors = FAISS.from_texts(texts, embeddings)
+        _save_index(vectors, index_dir)
+
+    _loaded_indexes[key] = vectors
+    return vectors.as_retriever(search_kwargs={"k": Config.PDF_RETRIEVER_K})
+
+
+class IngestStats:
+    """
+    Counters and throughput of one corpus ingestion.
+    """
+
+    def __init__(self):
+        self.files = 0
+        self.pages = 0
+        self.chunks = 0
+        self.batches = 0
+        self.retries = 0
+        self.started = time.monotonic()
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def finish(self):
+        self.seconds = time.monotonic() - self.started
+
+    def summary(self):
+        seconds = max(self.seconds, 1e-9)
+        return (f"Ingested {self.files} files: {self.pages} pages, {self.chunks} chunks in {self.batches} batches "
+                f"({self.retries} retries) in {self.seconds:.1f} s; "
+                f"{self.pages / seconds:.1f} pages/s, {self.chunks / seconds:.1f} chunks/s")
+
+
+def _extract_pages(pdf_path, start, stop):
+    # Runs in a worker process; returns plain tuples, which pickle cheaply
+    reader = PdfReader(pdf_path)
+    return [(reader.pages[number].extract_text() or "", {"source": pdf_path, "page": number})
+            for number in range(start, stop)]
+
+
+def iter_pages(pdf_paths, workers=Config.PDF_INGEST_WORKERS, pages_per_task=Config.PDF_PAGES_PER_TASK, stats=None):
+    """
+    Parse the pages of many PDFs across a process pool, yielding them in order.
+
+    Only a couple of page ranges per worker are in flight at a time, so
+    memory does not grow with the size of the corpus.
+
+    Args:
+        pdf_paths (list): Paths of the PDF files.
+        workers (int): Parsing processes.
+        pages_per_task (int): Pages parsed per task.
+        stats (IngestStats, optional): Counts files and pages.
+
+    Yields:
+        tuple: (page text, metadata) with the same metadata as ``PyPDFLoader``.
+    """
+    def tasks():
+        for pdf_path in pdf_paths:
+            page_count = len(PdfReader(pdf_path).pages)
+            if stats is not None:
+                stats.files += 1
+            for start in range(0, page_count, pages_per_task):
+                yield pdf_path, start, min(start + pages_per_task, page_count)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks():
+            pending.append(pool.submit(_extract_pages, *task))
+            if len(pending) < workers * 2:
+                continue
+            pages = pending.popleft().result()
+            if stats is not None:
+                stats.pages += len(pages)
+            yield from pages
+        while pending:
+            pages = pending.popleft().result()
+            if stats is not None:
+                stats.pages += len(pages)
+            yield from pages
+
+
+def iter_chunks(pages, text_splitter):
+    """
+    Split a stream of pages into a stream of (chunk text, metadata) pairs.
+    """
+    for text, metadata in pages:
+        for chunk in text_splitter.split_text(text):
+            yield chunk, dict(metadata)
+
+
+def _batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _embed_with_retry(embeddings, texts, retries, stats):
+    delay = 1.0
+    for attempt in range(retries + 1):
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            stats.add_retry()
+            logging.warning(f"Embedding batch of {len(texts)} chunks failed, retrying in {delay:.0f} s: {e}")
+            time.sleep(delay)
+            delay *= 2
+
+
+def iter_embedded_batches(batches, embeddings, concurrency=Config.PDF_EMBED_CONCURRENCY,
+                          retries=Config.PDF_EMBED_RETRIES, stats=None):
+    """
+    Embed batches of chunks with bounded concurrency, yielding them in order with their vectors.
+
+    Args:
+        batches (Iterable[list]): Batches of (chunk text, metadata) pairs.
+        embeddings (Embeddings): The embedding model.
+        concurrency (int): Embedding requests in flight.
+        retries (int): Retries per batch, with exponential backoff.
+        stats (IngestStats, optional): Counts retries.
+
+    Yields:
+        tuple: (batch, vectors).
+    """
+    stats = stats or IngestStats()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed") as pool:
+        pending = deque()
+        for batch in batches:
+            texts = [text for text, _ in batch]
+            pending.append((batch, pool.submit(_embed_with_retry, embeddings, texts, retries, stats)))
+            if len(pending) >= concurrency:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        while pending:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+
+
+def embeddings_id(embeddings):
+    """
+    Name the implementation behind an embeddings object: its class, model and dimensions.
+
+    Indexes built with different implementations never share a key, so a
+    run with stub embeddings cannot save vectors a real run later loads.
+    """
+    # The disk cache wraps the model that actually produces the vectors
+    embeddings = getattr(embeddings, "underlying_embeddings", embeddings)
+    kind = type(embeddings)
+    parts = [f"{kind.__module__}.{kind.__qualname__}"]
+    for attribute in ("model", "dimensions"):
+        value = getattr(embeddings, attribute, None)
+        if value is not None:
+            parts.append(f"{attribute}={value}")
+    return ":".join(parts)
+
+
+def corpus_key(pdf_paths, embeddings):
+    """
+    Identify the index of a whole corpus by the keys of its documents, in order,
+    and the embeddings that produced its vectors.
+    """
+    model = embeddings_id(embeddings)
+    keys = "\0".join(index_key(pdf_path, embedding_model=model) for pdf_path in pdf_paths)
+    return hashlib.sha256(keys.encode("utf-8")).hexdigest()
+
+
+def _corpus_index_dir(pdf_paths, embeddings):
+    return os.path.join(Config.PDF_INDEX_DIR, "indexes", corpus_key(pdf_paths, embeddings))
+
+
+def load_corpus(pdf_paths, embeddings=None):
+    """
+    Load the saved index of a corpus without building it.
+
+    Args:
+        pdf_paths (list): Paths of the PDF files.
+        embeddings (Embeddings, optional): Defaults to the disk-cached Google embeddings.
+
+    Returns:
+        FAISS vector store, or None if the corpus has not been ingested.
+    """
+    embeddings = embeddings or cached_embeddings()
+    index_dir = _corpus_index_dir(pdf_paths, embeddings)
+    if not os.path.isdir(index_dir):
+        return None
+    logging.info(f"Loading cached index for {len(pdf_paths)} files")
+    return _load_index(index_dir, embeddings)
+
+
+def _build_corpus(pdf_paths, embeddings, workers, batch_size, concurrency):
+    stats = IngestStats()
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=Config.PDF_CHUNK_SIZE,
+                                                   chunk_overlap=Config.PDF_CHUNK_OVERLAP)
+    chunks = iter_chunks(iter_pages(pdf_paths, workers, stats=stats), text_splitter)
+    vectors = None
+    for batch, batch_vectors in iter_embedded_batches(_batched(chunks, batch_size), embeddings, concurrency,
+                                                      stats=stats):
+        text_embeddings = [(text, vector) for (text, _), vector in zip(batch, batch_vectors)]
+        metadatas = [metadata for _, metadata in batch]
+        if vectors is None:
+            vectors = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas)
+        else:
+            vectors.add_embeddings(text_embeddings, metadatas=metadatas)
+        stats.chunks += len(batch)
+        stats.batches += 1
+    stats.finish()
+    logging.info(stats.summary())
+    return vectors, stats
+
+
+def ingest_corpus(pdf_paths, embeddings=None, workers=Config.PDF_INGEST_WORKERS,
+                  batch_size=Config.PDF_EMBED_BATCH_SIZE, concurrency=Config.PDF_EMBED_CONCURRENCY,
+                  persist=True):
+    """
+    Build one FAISS index over many PDFs.
+
+    Pages are parsed across a process pool and streamed through the
+    splitter. Chunks are embedded in batches, with bounded concurrency and
+    retries, and the vectors are added to the index batch by batch. Only
+    the index itself grows with the corpus.
+
+    A persisted index is built under a file lock: a process that finds the
+    corpus being ingested waits, then loads what the other one saved.
+
+    Args:
+        pdf_paths (list): Paths of the PDF files.
+        embeddings (Embeddings, optional): Defaults to the disk-cached Google embeddings.
+        workers (int): Parsing processes.
+        batch_size (int): Chunks per embedding request.
+        concurrency (int): Embedding requests in flight.
+        persist (bool): Save the index under ``Config.PDF_INDEX_DIR`` and reuse it next time.
+
+    Returns:
+        tuple: (FAISS vector store or None for an empty corpus, IngestStats).
+    """
+    embeddings = embeddings or cached_embeddings()
+    if not persist:
+        return _build_corpus(pdf_paths, embeddings, workers, batch_size, concurrency)
+
+    index_dir = _corpus_index_dir(pdf_paths, embeddings)
+    with _index_lock(index_dir):
+        if os.path.isdir(index_dir):
+            logging.info(f"Loading cached index for {len(pdf_paths)} files")
+            stats = IngestStats()
+            stats.finish()
+            return _load_index(index_dir, embeddings), stats
+        vectors, stats = _build_corpus(pdf_paths, embeddings, workers, batch_size, concurrency)
+        if vectors is not None:
+            _save_index(vectors, index_dir)
+    return vectors, stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Index a corpus of PDF files.")
+    parser.add_argument("pdf_paths", nargs="+")
+    parser.add_argument("--workers", type=int, default=Config.PDF_INGEST_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=Config.PDF_EMBED_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=Config.PDF_EMBED_CONCURRENCY)
+    parser.add_argument("--stub-embeddings", action="store_true",
+                        help="use the deterministic local stand-in instead of the embedding API")
+    parser.add_argument("--no-persist", action="store_true", help="do not save or reuse the index")
+    return parser.parse_args(argv)
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    final_documents = text_splitter.split_documents(docs)
 
-    texts = [doc.page_content for doc in final_documents]
-    
-    # Generate embeddings
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vectors = FAISS.from_texts(texts, embeddings)
-    
-    return vectors.as_retriever(search_kwargs={"k": 5})
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    embeddings = None
+    if args.stub_embeddings:
+        from stubs.embeddings import HashEmbeddings
+        embeddings = HashEmbeddings()
+    _, stats = ingest_corpus(args.pdf_paths, embeddings, workers=args.workers, batch_size=args.batch_size,
+                             concurrency=args.concurrency, persist=not args.no_persist)
+    print(stats.summary())
@@ -0,0 +1,351 @@
+# server.py
+"""
+The Twilio voice server: the /incoming-call webhook and the /media-stream WebSocket.
+
+Run it on its own, with one worker process per core by default:
+
+    python server.py --workers 4
+
+Each worker has its own event loop (uvloop when it is installed), provider
+clients and Cartesia pool. Call transcripts and the UI settings go through
+the shared SessionStore, which the Streamlit UI (app.py) reads.
+"""
+
+import argparse
+import asyncio
+import base64
+import importlib.util
+import json
+import logging
+import os
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, WebSocket, Request
+from fastapi.responses import Response, JSONResponse, StreamingResponse
+from fastapi.websockets import WebSocketDisconnect
+from twilio.twiml.voice_response import VoiceResponse, Connect
+
+from voice_assistant.response_generation import response_budget
+from voice_assistant.provider_router import (transcription_router, response_router, route_transcription,
+                                             route_response_stream, router_stats, ProvidersUnavailable)
+from voice_assistant.streaming_transcription import open_live_transcriber
+from voice_assistant.text_to_speech import (text_to_speech, stream_text_to_speech, get_tts_pool,
+                                            get_tts_cache, prewarm_tts_cache)
+from voice_assistant.text_chunker import SentenceChunker, chunk_text_stream
+from voice_assistant.api_key_manager import get_api_key, get_api_keys, key_pool_stats
+from voice_assistant.clients import prewarm_clients, pool_stats, close_clients
+from voice_assistant.local_services import local_service_stats, close_local_services
+from voice_assistant.config import Config
+from voice_assistant.inbound_audio import InboundAudioStream
+from voice_assistant.vad import SPEECH_START, SPEECH_END
+from voice_assistant.playback import PlaybackTracker
+from voice_assistant.executor import CallLimiter
+from voice_assistant.session import sessions
+from voice_assistant.session_store import SessionStore, default_settings
+from voice_assistant.retrieval import get_knowledge_base, build_knowledge_base, load_knowledge_base, context_message
+from voice_assistant.events import (event_bus, relay_store_events, CALL_STARTED, CALL_ENDED, TRANSCRIPT,
+                                    MESSAGE, BARGE_IN)
+from voice_assistant.metrics import (registry, active_calls, TurnTimer, timed_stream, monitor_event_loop_lag,
+                                     STT_DONE, RETRIEVAL_DONE, LLM_FIRST_TOKEN, LLM_DONE)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# uvloop is optional; uvicorn's default asyncio loop is used without it
+UVLOOP_AVAILABLE = importlib.util.find_spec("uvloop") is not None
+
+fastapi_app = FastAPI()
+session_store = SessionStore()
+
+@fastapi_app.on_event("startup")
+async def warm_provider_clients():
+    fastapi_app.state.loop_lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    fastapi_app.state.event_relay = None
+    if Config.VOICE_SERVER_WORKERS > 1:
+        # Dashboards reach a single worker; show them the other workers' calls too
+        fastapi_app.state.event_relay = asyncio.create_task(relay_store_events(event_bus, session_store))
+    # Fallback providers and every pooled key too, so no request starts on a cold connection
+    providers = [(model, api_key)
+                 for service, router in (("transcription", transcription_router), ("response", response_router))
+                 for model in router.chain
+                 for api_key in get_api_keys(service, model) or [None]]
+    # Connecting blocks, so do it off the event loop
+    await asyncio.get_running_loop().run_in_executor(None, prewarm_clients, providers)
+    await get_tts_pool().start()
+    await prewarm_tts_cache(Config.TTS_PREWARM_PHRASES)
+    await load_knowledge_base()
+
+@fastapi_app.on_event("shutdown")
+async def close_tts_pool():
+    fastapi_app.state.loop_lag_monitor.cancel()
+    if fastapi_app.state.event_relay is not None:
+        fastapi_app.state.event_relay.cancel()
+    await get_tts_pool().close()
+    await close_local_services()
+    close_clients()
+
+@fastapi_app.get("/")
+async def index():
+    return Response(content="Twilio AI Voice Assistant is running!", media_type="text/plain")
+
+@fastapi_app.get("/pool-stats")
+async def provider_pool_stats():
+    knowledge_base = get_knowledge_base()
+    return JSONResponse(content={"providers": pool_stats(), "tts": get_tts_pool().stats(),
+                                 "tts_cache": get_tts_cache().stats(), "local_services": local_service_stats(),
+                                 "routers": router_stats(), "api_keys": key_pool_stats(),
+                                 "knowledge_base": knowledge_base.stats() if knowledge_base else None})
+
+@fastapi_app.get("/metrics")
+async def metrics():
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4")
+
+@fastapi_app.get("/sessions")
+async def live_sessions():
+    return JSONResponse(content={"sessions": sessions.stats(), "events": event_bus.stats()})
+
+@fastapi_app.get("/events")
+async def live_events():
+    subscription = event_bus.subscribe()
+    if subscription is None:
+        return JSONResponse(status_code=503, content={"error": "Too many event subscribers"})
+
+    async def stream():
+        try:
+            while True:
+                event = await subscription.get(timeout=Config.EVENT_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@fastapi_app.api_route("/incoming-call", methods=["GET", "POST"])
+async def handle_incoming_call(request: Request):
+    response = VoiceResponse()
+    connect = Connect()
+    connect.stream(url=f'wss://{request.url.hostname}/media-stream')
+    response.append(connect)
+    return Response(content=str(response), media_type="application/xml")
+
+@fastapi_app.websocket("/media-stream")
+async def media_stream(websocket: WebSocket):
+    await websocket.accept()
+    stream_sid = None
+    inbound_audio = InboundAudioStream()
+    call_limiter = CallLimiter()
+    turn_task = None
+    playback = None  # PlaybackTracker of the latest turn's reply
+    unanswered_audio = None  # caller audio of the latest turn
+    transcriber = None  # live transcription connection, if streaming STT is enabled
+    session = None  # conversation memory of this call
+    settings = default_settings()  # system prompt and reply length, read from the store at call start
+
+    async def receive_from_twilio():
+        nonlocal stream_sid, turn_task, playback, unanswered_audio, transcriber, session, settings
+        try:
+            while True:
+                message = await websocket.receive_text()
+                data = json.loads(message)
+
+                if data["event"] == "start":
+                    stream_sid = data["start"]["streamSid"]
+                    session = sessions.create(stream_sid)
+                    active_calls.inc()
+                    session_store.submit(session_store.start_call, stream_sid)
+                    event_bus.publish(CALL_STARTED, stream_sid)
+                    settings = await session_store.submit(session_store.get_settings)
+                    transcriber = await open_live_transcriber(
+                        Config.STREAMING_TRANSCRIPTION_MODEL,
+                        get_api_key("transcription", Config.STREAMING_TRANSCRIPTION_MODEL),
+                        on_transcript=log_transcript
+                    )
+                    playback = PlaybackTracker()
+                    turn_task = asyncio.create_task(send_ai_intro(playback))
+                elif data["event"] == "media":
+                    audio = base64.b64decode(data["media"]["payload"])
+                    if transcriber is not None:
+                        await transcriber.send_audio(audio)
+                    for event in inbound_audio.feed_ulaw(audio):
+                        if event.kind == SPEECH_START:
+                            # Barge-in: the caller talks over audio they can hear
+                            if playback is not None and playback.sent_ms and playback.is_playing:
+                                await interrupt()
+                        elif event.kind == SPEECH_END:
+                            timer = TurnTimer()
+                            utterance = inbound_audio.read_utterance(event)
+                            if turn_task is not None and not turn_task.done():
+                                if playback.sent_ms:
+                                    # The reply started playing after the caller spoke up; stop it and clear Twilio
+                                    await interrupt()
+                                else:
+                                    # The caller kept talking before we answered; answer it all at once
+                                    await cancel_turn()
+                                    if unanswered_audio is not None:
+                                        utterance = np.concatenate((unanswered_audio, utterance))
+                            unanswered_audio = utterance
+                            playback = PlaybackTracker()
+                            turn_task = asyncio.create_task(run_turn(utterance, playback, timer))
+                elif data["event"] == "mark":
+                    if playback is not None:
+                        playback.on_mark(data["mark"]["name"])
+                elif data["event"] == "stop":
+                    logging.info("User ended the call.")
+                    await websocket.close()
+                    break
+        except WebSocketDisconnect:
+            logging.info("User disconnected.")
+        finally:
+            await cancel_turn()
+            if transcriber is not None:
+                await transcriber.close()
+            if stream_sid is not None:
+                sessions.remove(stream_sid)
+                active_calls.dec()
+                session_store.submit(session_store.end_call, stream_sid)
+                event_bus.publish(CALL_ENDED, stream_sid)
+
+    def log_transcript(event):
+        kind = "Final" if event.is_final else "Interim"
+        logging.info(f"{kind} transcript: {event.text}")
+        event_bus.publish(TRANSCRIPT, stream_sid, text=event.text, is_final=event.is_final)
+        knowledge_base = get_knowledge_base()
+        if event.is_final and knowledge_base is not None:
+            # Start the search before the caller stops talking
+            knowledge_base.prefetch(transcriber.final_text())
+
+    def record_message(role, content):
+        session_store.submit(session_store.add_message, stream_sid, role, content)
+        event_bus.publish(MESSAGE, stream_sid, role=role, content=content)
+
+    async def cancel_turn():
+        if turn_task is not None and not turn_task.done():
+            turn_task.cancel()
+            await asyncio.gather(turn_task, return_exceptions=True)
+
+    async def interrupt():
+        logging.info("Caller interrupted; stopping playback.")
+        event_bus.publish(BARGE_IN, stream_sid)
+        playback.interrupt()
+        # Cancelling the turn stops both the LLM stream and the Cartesia context
+        await cancel_turn()
+        # Drop the audio Twilio has buffered but not played yet
+        await websocket.send_text(json.dumps({"event": "clear", "streamSid": stream_sid}))
+
+    async def transcribe_turn(utterance):
+        if transcriber is not None and transcriber.is_open:
+            transcribed_text = await transcriber.take_utterance()
+            if transcribed_text:
+                return transcribed_text
+        # Batch transcription of the utterance audio is the fallback
+        return await route_transcription(utterance, inbound_audio.sample_rate, call_limiter=call_limiter)
+
+    async def run_turn(utterance, tracker, timer):
+        outcome = "failed"
+        try:
+            transcribed_text = await transcribe_turn(utterance)
+            timer.mark(STT_DONE)
+
+            if not transcribed_text:
+                outcome = "empty"
+                return
+
+            # Runs while the prompt is assembled, within its time budget
+            knowledge_base = get_knowledge_base()
+            retrieval = (asyncio.create_task(knowledge_base.retrieve(transcribed_text))
+                         if knowledge_base is not None else None)
+
+            user_turn = session.add_turn("user", transcribed_text)
+            reply_turn = session.add_turn("assistant", "")
+            answered = True
+            try:
+                await answer_turn(tracker, timer, retrieval)
+                # A barge-in during the rest of playback cancels this wait, keeping only what was heard
+                await tracker.wait_played()
+            except asyncio.CancelledError:
+                if not tracker.sent_ms:
+                    # Unanswered; the next turn answers this text together with its own
+                    answered = False
+                    session.discard_turns(user_turn, reply_turn)
+                    if transcriber is not None:
+                        transcriber.restore(transcribed_text)
+                raise
+            finally:
+                # Only keep what the caller actually heard
+                session.update_turn(reply_turn, tracker.played_text())
+                if answered:
+                    record_message("user", user_turn.content)
+                    record_message("assistant", reply_turn.content)
+            outcome = "completed"
+        except ProvidersUnavailable as e:
+            logging.error(f"Turn failed: {e}")
+            await send_fallback(tracker)
+        except Exception:
+            logging.exception("Turn failed")
+            await send_fallback(tracker)
+        except asyncio.CancelledError:
+            outcome = "interrupted" if tracker.sent_ms else "superseded"
+            raise
+        finally:
+            timer.finish(outcome)
+
+    async def send_fallback(tracker):
+        # Say something rather than leave the caller in silence
+        try:
+            await text_to_speech(Config.FALLBACK_MESSAGE, websocket, stream_sid, playback=tracker)
+        except Exception:
+            logging.exception("Failed to send the fallback message")
+
+    async def answer_turn(tracker, timer, retrieval=None):
+        budget = response_budget(settings["response_length"])
+        chat_history = session.prompt(f"{settings['system_prompt']} Keep your reply under {budget.max_words} words.")
+        if retrieval is not None:
+            passages = await retrieval
+            timer.mark(RETRIEVAL_DONE)
+            if passages:
+                chat_history.insert(1, context_message(passages))
+        tokens = route_response_stream(chat_history, max_tokens=budget.max_tokens, call_limiter=call_limiter)
+        tokens = timed_stream(tokens, timer, LLM_FIRST_TOKEN, LLM_DONE)
+        reply_chunks = chunk_text_stream(tokens, SentenceChunker(word_budget=budget.max_words))
+        await stream_text_to_speech(reply_chunks, websocket, stream_sid, playback=tracker, timer=timer)
+
+    async def send_ai_intro(tracker):
+        if not stream_sid:
+            return
+
+        try:
+            await text_to_speech(Config.INTRO_MESSAGE, websocket, stream_sid, playback=tracker)
+            await tracker.wait_played()
+        except Exception:
+            # The call goes on; the caller can still speak first
+            logging.exception("Failed to send the intro")
+        finally:
+            heard = tracker.played_text()
+            if heard:
+                session.add_turn("assistant", heard)
+                record_message("assistant", heard)
+
+    await receive_from_twilio()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Twilio voice server.")
+    parser.add_argument("--host", default=Config.VOICE_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.VOICE_SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=Config.VOICE_SERVER_WORKERS,
+                        help="worker processes; every call stays on the worker that accepted it")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # The workers read their configuration from the environment
+    os.environ["VOICE_SERVER_WORKERS"] = str(args.workers)
+    # Index the knowledge base once, before the workers start; they only load it
+    build_knowledge_base()
+    # Workers import the app by name, each in its own process
+    uvicorn.run("server:fastapi_app", host=args.host, port=args.port, workers=args.workers,
+                loop="uvloop" if UVLOOP_AVAILABLE else "asyncio")
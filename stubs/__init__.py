@@ -0,0 +1,2 @@
+# stubs/__init__.py
+# Local stand-ins for the hosted providers, used for testing and load tests.
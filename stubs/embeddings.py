@@ -0,0 +1,48 @@
+# stubs/embeddings.py
+
+import hashlib
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic stand-in for an embedding API.
+
+    Every text maps to a fixed unit vector seeded from its SHA-256, so the
+    same text always gets the same vector, across runs and processes. A
+    per-request ``latency`` mimics the network round trip, and with
+    ``fail_every`` every Nth request raises, which exercises the retries.
+    """
+
+    def __init__(self, dimensions=768, latency=0.0, fail_every=0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.fail_every = fail_every
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _request(self):
+        with self._lock:
+            self.requests += 1
+            request = self.requests
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_every and request % self.fail_every == 0:
+            raise RuntimeError(f"Stub embedding request {request} failed")
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        self._request()
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self._request()
+        return self._vector(text)
@@ -0,0 +1,97 @@
+# stubs/llm_server.py
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _completion(model, content, finish_reason):
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                     "finish_reason": finish_reason}],
+    }
+
+
+def _chunk(completion_id, model, delta, finish_reason=None):
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def create_app(args):
+    """
+    Build an OpenAI-compatible chat completions stand-in.
+
+    Every request is answered with the configured reply, one word per token,
+    after ``latency`` seconds and then one token every ``token_interval``
+    seconds. ``max_tokens`` is honoured, so reply budgets behave as they do
+    against a real provider. Both the OpenAI (``/v1``) and Groq
+    (``/openai/v1``) paths are served.
+    """
+    app = FastAPI()
+    words = args.text.split()
+
+    async def models():
+        return JSONResponse(content={"object": "list", "data": [
+            {"id": "stub", "object": "model", "created": 0, "owned_by": "stub"}]})
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "stub")
+        max_tokens = body.get("max_tokens") or len(words)
+        tokens = [f" {word}" if index else word for index, word in enumerate(words[:max_tokens])]
+        finish_reason = "length" if max_tokens < len(words) else "stop"
+
+        if not body.get("stream"):
+            await asyncio.sleep(args.latency + args.token_interval * len(tokens))
+            return JSONResponse(content=_completion(model, "".join(tokens), finish_reason))
+
+        async def events():
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            await asyncio.sleep(args.latency)
+            yield f"data: {json.dumps(_chunk(completion_id, model, {'role': 'assistant', 'content': ''}))}\n\n"
+            for token in tokens:
+                yield f"data: {json.dumps(_chunk(completion_id, model, {'content': token}))}\n\n"
+                await asyncio.sleep(args.token_interval)
+            yield f"data: {json.dumps(_chunk(completion_id, model, {}, finish_reason))}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    for prefix in ("/v1", "/openai/v1"):
+        app.add_api_route(f"{prefix}/models", models, methods=["GET"])
+        app.add_api_route(f"{prefix}/chat/completions", chat_completions, methods=["POST"])
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stand-in for OpenAI/Groq chat completions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--text", default="We are open from nine in the morning until six in the evening today. "
+                                          "Is there anything else I can help you with?")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="seconds between tokens")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
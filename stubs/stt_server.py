@@ -0,0 +1,110 @@
+# stubs/stt_server.py
+
+import argparse
+import asyncio
+import json
+import logging
+
+import numpy as np
+import websockets
+
+from voice_assistant.codec import ulaw_to_pcm16
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class StubTranscriptionSession:
+    """
+    Fakes Deepgram live transcription for one connection.
+
+    It does not recognize anything: while the caller's audio is loud it
+    reveals the configured transcript word by word as interim results, and
+    after ``endpointing_ms`` of quiet audio it sends the whole utterance as a
+    final result. The output only depends on the audio, so runs are repeatable.
+    """
+
+    def __init__(self, ws, text, latency, endpointing_ms, words_per_second, energy_threshold):
+        self.ws = ws
+        self.words = text.split()
+        self.latency = latency
+        self.endpointing_samples = endpointing_ms * 8
+        self.samples_per_word = int(8000 / words_per_second)
+        self.energy_threshold = energy_threshold
+        self.voiced_samples = 0
+        self.silent_samples = 0
+        self.words_sent = 0
+
+    async def send_result(self, is_final):
+        count = max(1, min(len(self.words), self.voiced_samples // self.samples_per_word))
+        self.words_sent = count
+        message = json.dumps({
+            "type": "Results",
+            "channel": {"alternatives": [{"transcript": " ".join(self.words[:count]), "confidence": 1.0}]},
+            "is_final": is_final,
+            "speech_final": is_final,
+        })
+        # Delay the result without holding up the incoming audio
+        asyncio.create_task(self._send_later(message))
+
+    async def _send_later(self, message):
+        await asyncio.sleep(self.latency)
+        try:
+            await self.ws.send(message)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def feed(self, ulaw_bytes):
+        pcm = ulaw_to_pcm16(ulaw_bytes).astype(np.float32)
+        loud = len(pcm) and np.sqrt(np.mean(pcm * pcm)) >= self.energy_threshold
+        if loud:
+            self.voiced_samples += len(pcm)
+            self.silent_samples = 0
+            if self.voiced_samples // self.samples_per_word > self.words_sent:
+                await self.send_result(is_final=False)
+        elif self.voiced_samples:
+            self.silent_samples += len(pcm)
+            if self.silent_samples >= self.endpointing_samples:
+                await self.finish()
+
+    async def finish(self):
+        if self.voiced_samples:
+            await self.send_result(is_final=True)
+        self.voiced_samples = 0
+        self.silent_samples = 0
+        self.words_sent = 0
+
+
+def make_handler(args):
+    async def handler(ws, *_):
+        session = StubTranscriptionSession(ws, args.text, args.latency, args.endpointing_ms,
+                                           args.words_per_second, args.energy_threshold)
+        async for message in ws:
+            if isinstance(message, bytes):
+                await session.feed(message)
+            elif json.loads(message).get("type") == "CloseStream":
+                await session.finish()
+                await asyncio.sleep(args.latency)
+                break
+    return handler
+
+
+async def serve(args):
+    async with websockets.serve(make_handler(args), args.host, args.port, subprotocols=["token"]):
+        logging.info(f"Stub live transcription server listening on ws://{args.host}:{args.port}")
+        await asyncio.Future()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stand-in for Deepgram live transcription.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--text", default="what are your opening hours today")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each result")
+    parser.add_argument("--endpointing-ms", type=int, default=300)
+    parser.add_argument("--words-per-second", type=float, default=3.0)
+    parser.add_argument("--energy-threshold", type=float, default=300.0)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(parse_args()))
@@ -0,0 +1,115 @@
+# stubs/tts_server.py
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+
+import websockets
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Mu-law silence; the content of the audio does not matter to a load test
+_SILENCE = b"\xff"
+
+
+class StubContext:
+    """
+    Fakes one Cartesia generation context.
+
+    Transcripts are queued as they arrive. After ``latency`` seconds each one
+    is turned into ``ms_per_char`` of silent 8 kHz mu-law per character, sent
+    in ``chunk_ms`` pieces at ``speed`` times real time, with word timestamps
+    when they were asked for. ``done`` follows once the context is closed.
+    """
+
+    def __init__(self, ws, context_id, args):
+        self.ws = ws
+        self.context_id = context_id
+        self.args = args
+        self.transcripts = asyncio.Queue()
+        self.add_timestamps = False
+        self.task = asyncio.create_task(self.run())
+
+    def add(self, request):
+        self.add_timestamps = self.add_timestamps or request.get("add_timestamps", False)
+        self.transcripts.put_nowait(request.get("transcript", ""))
+        if not request.get("continue", False):
+            self.transcripts.put_nowait(None)
+
+    async def send(self, message):
+        message["context_id"] = self.context_id
+        await self.ws.send(json.dumps(message))
+
+    async def run(self):
+        await asyncio.sleep(self.args.latency)
+        offset_ms = 0.0
+        chunk_bytes = self.args.chunk_ms * 8
+        while True:
+            text = await self.transcripts.get()
+            if text is None:
+                break
+            if not text.strip():
+                continue
+            duration_ms = len(text.strip()) * self.args.ms_per_char
+            if self.add_timestamps:
+                words = text.split()
+                step = duration_ms / len(words) / 1000
+                await self.send({"type": "timestamps", "word_timestamps": {
+                    "words": words,
+                    "start": [offset_ms / 1000 + index * step for index in range(len(words))],
+                    "end": [offset_ms / 1000 + (index + 1) * step for index in range(len(words))],
+                }})
+            audio = _SILENCE * int(duration_ms * 8)
+            for start in range(0, len(audio), chunk_bytes):
+                chunk = audio[start:start + chunk_bytes]
+                await self.send({"type": "chunk", "data": base64.b64encode(chunk).decode("ascii"), "done": False})
+                await asyncio.sleep(len(chunk) / 8000 / self.args.speed)
+            offset_ms += duration_ms
+        await self.send({"type": "done", "done": True})
+
+
+def make_handler(args):
+    async def handler(ws, *_):
+        contexts = {}
+        try:
+            async for message in ws:
+                request = json.loads(message)
+                context_id = request.get("context_id")
+                if request.get("cancel"):
+                    context = contexts.pop(context_id, None)
+                    if context is not None:
+                        context.task.cancel()
+                    continue
+                context = contexts.get(context_id)
+                if context is None or context.task.done():
+                    context = contexts[context_id] = StubContext(ws, context_id, args)
+                context.add(request)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for context in contexts.values():
+                context.task.cancel()
+    return handler
+
+
+async def serve(args):
+    async with websockets.serve(make_handler(args), args.host, args.port):
+        logging.info(f"Stub TTS server listening on ws://{args.host}:{args.port}")
+        await asyncio.Future()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stand-in for the Cartesia TTS WebSocket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds before the first audio")
+    parser.add_argument("--ms-per-char", type=float, default=60.0, help="audio produced per character")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="audio per message")
+    parser.add_argument("--speed", type=float, default=4.0, help="generation speed relative to real time")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(parse_args()))
@@ -1,56 +1,334 @@
 # voice_assistant/api_key_manager.py
 
+import asyncio
+import email.utils
+import logging
+import threading
+import time
+
 from voice_assistant.config import Config
 
-API_KEY_MAPPING= {
-    "transcription":{
-        "openai": Config.OPENAI_API_KEY,
-        "groq": Config.GROQ_API_KEY,
-        "deepgram": Config.DEEPGRAM_API_KEY
-    },
-    "response":{
-        "openai":Config.OPENAI_API_KEY,
-        "groq": Config.GROQ_API_KEY
-    },
-    "tts": {
-        "openai": Config.OPENAI_API_KEY,
-        "deepgram":Config.DEEPGRAM_API_KEY,
-        "elevenlabs": Config.ELEVENLABS_API_KEY
-    }
+# Providers each service can use with an API key
+SERVICE_PROVIDERS = {
+    "transcription": ("openai", "groq", "deepgram"),
+    "response": ("openai", "groq"),
+    "tts": ("openai", "deepgram", "elevenlabs", "cartesia"),
 }
 
-def get_api_key(service, model):
+
+class TokenBucket:
     """
-    Select the API key for the specified service and model
-    
-    Returns:
-    str: The API key for the transcription, response or tts service.
+    A per-minute budget that refills continuously.
+
+    Taking more than is left is allowed and leaves the bucket in debt, so a
+    request whose size was underestimated still delays the next ones.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.level = float(per_minute or 0)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """
+        Seconds until ``amount`` can be taken; 0 for an unmetered bucket.
+        """
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60.0 / self.capacity)
+
+    def take(self, amount, now):
+        if self.capacity:
+            self._refill(now)
+            self.level -= amount
+
+    def used(self, now):
+        """
+        Fraction of the budget in use, 0 for an unmetered bucket.
+        """
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        return 1.0 - self.level / self.capacity
+
+
+class _KeyState:
+    """
+    Accounting for one API key.
     """
-    return API_KEY_MAPPING.get(service, {}).get(model)
 
-def get_transcription_api_key():
+    def __init__(self, key, requests_per_minute=None, tokens_per_minute=None):
+        self.key = key
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.in_flight = 0
+        self.leases = 0
+        self.rate_limited = 0
+        self.cooldown_until = 0.0
+
+    def wait_time(self, tokens, now):
+        return max(self.cooldown_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+
+    def load(self, now):
+        return self.in_flight + max(self.requests.used(now), self.tokens.used(now))
+
+
+def retry_after(error):
     """
-    Select the correct API key for transcription based on the configured model.
-    
+    Find a rate-limit response behind an error and how long it asked us to wait.
+
+    The error and whatever caused it are searched, so a provider error
+    wrapped in a generic exception is still recognized.
+
+    Args:
+        error (BaseException): The failure of a request.
+
     Returns:
-    str: The API key for the transcription service.
+        float | None: Seconds to wait, or None if the error is not a rate limit.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        response = getattr(error, "response", None)
+        status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+        if status == 429:
+            header = getattr(response, "headers", {}).get("retry-after")
+            if header is None:
+                return Config.API_KEY_DEFAULT_COOLDOWN
+            try:
+                return max(0.0, float(header))
+            except ValueError:
+                pass
+            # Retry-After may also be an HTTP date
+            try:
+                retry_at = email.utils.parsedate_to_datetime(header).timestamp()
+            except (TypeError, ValueError):
+                logging.warning(f"Unreadable Retry-After header: {header!r}")
+                return Config.API_KEY_DEFAULT_COOLDOWN
+            return max(0.0, retry_at - time.time())
+        error = error.__cause__ or error.__context__
+    return None
+
+
+class KeysUnavailable(Exception):
+    """
+    Raised when every key of a provider is resting after a rate limit.
+    """
+
+
+class KeyLease:
+    """
+    One request's use of an API key, counted until it is released.
+
+    Use it as a context manager; an exception leaving the block is checked
+    for a rate limit, which cools the key down.
     """
-    return get_api_key("transcription", Config.TRANSCRIPTION_MODEL)
 
-def get_response_api_key():
+    def __init__(self, pool, state):
+        self.pool = pool
+        self.state = state
+        self.released = False
+        self.kept = False
+
+    def keep(self):
+        """
+        Keep the key leased past the ``lease_api_key`` block, e.g. while a
+        response streams; whoever consumes the response then calls ``release``.
+        """
+        self.kept = True
+
+    @property
+    def key(self):
+        return self.state.key if self.state is not None else None
+
+    def release(self, error=None):
+        """
+        Give the key back.
+
+        Args:
+            error (BaseException, optional): Why the request failed; a 429 cools the key down.
+        """
+        if self.released or self.state is None:
+            return
+        self.released = True
+        self.pool.release(self.state, error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release(exc)
+
+
+class KeyPool:
     """
-    Select the correct API key for response generation based on the configured model.
-    
+    Every API key of one provider, with per-key rate-limit accounting.
+
+    Each lease goes to the least-loaded key that has request and token
+    budget left this minute. A key that gets a 429 sits out for as long as
+    the provider's Retry-After asks. When every key is out of budget,
+    ``lease`` waits for the first one to recover, up to ``max_wait``; after
+    that it goes over budget on a key, but never uses one that is resting.
+    """
+
+    def __init__(self, provider, keys, requests_per_minute=None, tokens_per_minute=None,
+                 max_wait=Config.API_KEY_MAX_WAIT):
+        self.provider = provider
+        self.max_wait = max_wait
+        self.states = [_KeyState(key, requests_per_minute, tokens_per_minute) for key in keys]
+        self._lock = threading.Lock()
+
+    def _pick(self, tokens, states=None):
+        now = time.monotonic()
+        state = min(states or self.states, key=lambda s: (s.wait_time(tokens, now), s.load(now)))
+        return state, state.wait_time(tokens, now)
+
+    def _take(self, state, tokens):
+        now = time.monotonic()
+        state.requests.take(1, now)
+        state.tokens.take(tokens, now)
+        state.in_flight += 1
+        state.leases += 1
+        return KeyLease(self, state)
+
+    async def lease(self, tokens=0):
+        """
+        Lease the least-loaded key with budget, waiting up to ``max_wait`` for one.
+
+        Args:
+            tokens (int): Estimated tokens of the request, for the tokens-per-minute budget.
+
+        Returns:
+            KeyLease: The lease; its ``key`` is None if the provider has no keys.
+
+        Raises:
+            KeysUnavailable: If every key is still resting after a rate limit at ``max_wait``.
+        """
+        if not self.states:
+            return KeyLease(self, None)
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            with self._lock:
+                state, wait = self._pick(tokens)
+                now = time.monotonic()
+                if wait <= 0:
+                    return self._take(state, tokens)
+                if now >= deadline:
+                    rested = [candidate for candidate in self.states if candidate.cooldown_until <= now]
+                    if not rested:
+                        raise KeysUnavailable(f"Every {self.provider} key is rate limited")
+                    state, _ = self._pick(tokens, rested)
+                    return self._take(state, tokens)
+                remaining = deadline - now
+            await asyncio.sleep(min(wait, remaining))
+
+    def release(self, state, error=None):
+        with self._lock:
+            state.in_flight -= 1
+            cooldown = retry_after(error) if error is not None else None
+            if cooldown is not None:
+                state.rate_limited += 1
+                state.cooldown_until = max(state.cooldown_until, time.monotonic() + cooldown)
+                logging.warning(f"{self.provider} key ...{state.key[-4:]} rate limited; resting {cooldown:.1f} s")
+
+    def keys(self):
+        return [state.key for state in self.states]
+
+    def stats(self):
+        now = time.monotonic()
+        return [{
+            "api_key": f"...{state.key[-4:]}",
+            "in_flight": state.in_flight,
+            "leases": state.leases,
+            "rate_limited": state.rate_limited,
+            "cooling_down": round(max(0.0, state.cooldown_until - now), 1),
+            "load": round(state.load(now), 2),
+        } for state in self.states]
+
+
+_pools = {provider: KeyPool(provider, keys, **Config.API_KEY_RATE_LIMITS.get(provider, {}))
+          for provider, keys in Config.API_KEYS.items()}
+
+
+def _pool(service, model):
+    if model not in SERVICE_PROVIDERS.get(service, ()):
+        return None
+    return _pools.get(model)
+
+
+class _LeaseContext:
+    def __init__(self, pool, tokens):
+        self.pool = pool
+        self.tokens = tokens
+        self.lease = None
+
+    async def __aenter__(self):
+        self.lease = await self.pool.lease(self.tokens) if self.pool is not None else KeyLease(None, None)
+        return self.lease
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc is not None or not self.lease.kept:
+            self.lease.release(exc)
+
+
+def lease_api_key(service, model, tokens=0):
+    """
+    Lease an API key for one request of the specified service and model.
+
+    Use it as ``async with lease_api_key("response", "groq", tokens) as lease:``
+    and send the request with ``lease.key``. The key stays counted as busy
+    until the block exits, or, after ``lease.keep()``, until ``lease.release()``.
+    A rate-limit error raised out of the block cools the key down.
+
+    Args:
+        service (str): 'transcription', 'response' or 'tts'.
+        model (str): The provider.
+        tokens (int): Estimated tokens of the request.
+
     Returns:
-    str: The API key for the response generation service.
+        An async context manager giving a KeyLease; its ``key`` is None for
+        providers without API keys (e.g. 'ollama', 'fastwhisperapi').
+
+    Raises:
+        KeysUnavailable: If every key of the provider is resting after a rate limit.
     """
-    return get_api_key("response", Config.RESPONSE_MODEL)
+    return _LeaseContext(_pool(service, model), tokens)
+
 
-def get_tts_api_key():
+def get_api_key(service, model):
     """
-    Select the correct API key for text-to-speech based on the configured model.
-    
+    Select the least-loaded API key for the specified service and model, without leasing it.
+
+    For setup that is not a metered request, such as pre-connecting clients
+    or opening a streaming connection.
+
     Returns:
-    str: The API key for the TTS service.
+    str: The API key for the transcription, response or tts service.
+    """
+    pool = _pool(service, model)
+    if pool is None or not pool.states:
+        return None
+    with pool._lock:
+        state, _ = pool._pick(0)
+        return state.key
+
+
+def get_api_keys(service, model):
+    """
+    Return every API key for the specified service and model.
+    """
+    pool = _pool(service, model)
+    return pool.keys() if pool is not None else []
+
+
+def key_pool_stats():
+    """
+    Describe the keys of every provider that has them.
     """
-    return get_api_key("tts", Config.TTS_MODEL)
\ No newline at end of file
+    return {provider: pool.stats() for provider, pool in _pools.items() if pool.states}
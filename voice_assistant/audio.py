@@ -4,11 +4,11 @@ import speech_recognition as sr
 import pygame
 import time
 import logging
-import pydub
 from io import BytesIO
-from pydub import AudioSegment
 from functools import lru_cache
 
+from voice_assistant.codec import resample, wav_to_pcm16, write_wav
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -19,11 +19,16 @@ def get_recognizer():
     """
     return sr.Recognizer()
 
-def record_audio(file_path, stop_event=None, timeout=10, phrase_time_limit=None, 
+def record_audio(file_path=None, stop_event=None, timeout=10, phrase_time_limit=None, 
                  energy_threshold=2000, pause_threshold=1, phrase_threshold=0.1, 
                  dynamic_energy_threshold=True, calibration_duration=1):
     """
-    Record audio from the microphone and save it as an MP3 file.
+    Record audio from the microphone.
+
+    Without a ``file_path`` the recording is returned in memory as a WAV
+    BytesIO that transcribe_audio accepts directly; with one it is saved at
+    22.05 kHz mono and the path is returned. A ``.wav`` path is written in
+    process; other formats still go through pydub and ffmpeg.
     """
     recognizer = get_recognizer()
     recognizer.energy_threshold = energy_threshold
@@ -62,6 +67,14 @@ def record_audio(file_path, stop_event=None, timeout=10, phrase_time_limit=None,
 
             logging.info("Recording complete.")
             wav_data = audio_data.get_wav_data()
+            if file_path is None:
+                return BytesIO(wav_data)
+            if file_path.lower().endswith(".wav"):
+                pcm, sample_rate, channels = wav_to_pcm16(wav_data)
+                if channels > 1:
+                    pcm = pcm.reshape(-1, channels).mean(axis=1).astype("<i2")
+                return write_wav(file_path, resample(pcm, sample_rate, 22050), 22050)
+            import pydub
             audio_segment = pydub.AudioSegment.from_wav(BytesIO(wav_data))
             audio_segment.export(file_path, format="mp3", bitrate="128k", parameters=["-ar", "22050", "-ac", "1"])
             return file_path
@@ -0,0 +1,163 @@
+# voice_assistant/clients.py
+
+import importlib.util
+import logging
+import threading
+import time
+
+import httpx
+import ollama
+from openai import OpenAI
+from groq import Groq
+from deepgram import DeepgramClient
+
+from voice_assistant.config import Config
+
+# HTTP/2 needs the optional ``h2`` package; fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+POOLED_PROVIDERS = ('openai', 'groq', 'deepgram', 'ollama')
+
+_clients = {}
+_lock = threading.Lock()
+
+
+class _ClientEntry:
+    """
+    A provider SDK client together with the HTTP pool it owns.
+    """
+
+    def __init__(self, provider, client, http_client):
+        self.provider = provider
+        self.client = client
+        self.http_client = http_client
+        self.created_at = time.time()
+        self.uses = 0
+        self._uses_lock = threading.Lock()
+
+    def record_use(self):
+        # get_client runs on many worker threads at once
+        with self._uses_lock:
+            self.uses += 1
+
+
+def _new_http_client():
+    return httpx.Client(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(Config.PROVIDER_TIMEOUT, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=Config.PROVIDER_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.PROVIDER_MAX_CONNECTIONS,
+            keepalive_expiry=Config.PROVIDER_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def _create_client(provider, api_key):
+    if provider == 'openai':
+        http_client = _new_http_client()
+        return OpenAI(api_key=api_key, http_client=http_client), http_client
+    elif provider == 'groq':
+        http_client = _new_http_client()
+        return Groq(api_key=api_key, http_client=http_client), http_client
+    elif provider == 'deepgram':
+        # The Deepgram SDK manages its own HTTP transport
+        return DeepgramClient(api_key), None
+    elif provider == 'ollama':
+        client = ollama.Client()
+        return client, getattr(client, "_client", None)
+    else:
+        raise ValueError(f"Unsupported provider: {provider}")
+
+
+def get_client(provider, api_key=None):
+    """
+    Return the long-lived client for a provider and API key, creating it on first use.
+
+    Args:
+        provider (str): The provider name ('openai', 'groq', 'deepgram', 'ollama').
+        api_key (str): The API key the client authenticates with.
+
+    Returns:
+        The provider SDK client.
+    """
+    key = (provider, api_key)
+    entry = _clients.get(key)
+    if entry is None:
+        with _lock:
+            entry = _clients.get(key)
+            if entry is None:
+                client, http_client = _create_client(provider, api_key)
+                entry = _ClientEntry(provider, client, http_client)
+                _clients[key] = entry
+                logging.info(f"Created pooled {provider} client.")
+    entry.record_use()
+    return entry.client
+
+
+def _preconnect(provider, client):
+    if provider in ('openai', 'groq'):
+        client.models.list()
+    elif provider == 'ollama':
+        client.list()
+
+
+def prewarm_clients(providers):
+    """
+    Create clients and open their connections ahead of the first call.
+
+    Args:
+        providers (iterable): (provider, api_key) pairs to warm up.
+    """
+    for provider, api_key in providers:
+        if provider not in POOLED_PROVIDERS:
+            continue
+        try:
+            client = get_client(provider, api_key)
+            _preconnect(provider, client)
+            logging.info(f"Pre-connected {provider} client.")
+        except Exception as e:
+            logging.warning(f"Failed to pre-connect {provider} client: {e}")
+
+
+def _open_connections(http_client):
+    # httpx does not expose pool state publicly, so look it up defensively
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return None
+    return {
+        "open": len(connections),
+        "idle": sum(1 for connection in connections if connection.is_idle()),
+    }
+
+
+def pool_stats():
+    """
+    Describe every pooled client and its connection pool.
+
+    Returns:
+        list: One dict per client with provider, masked key, age, uses and connections.
+    """
+    stats = []
+    for (provider, api_key), entry in list(_clients.items()):
+        stats.append({
+            "provider": provider,
+            "api_key": f"...{api_key[-4:]}" if api_key else None,
+            "age_seconds": round(time.time() - entry.created_at, 1),
+            "uses": entry.uses,
+            "http2": HTTP2_AVAILABLE and entry.http_client is not None,
+            "connections": _open_connections(entry.http_client) if entry.http_client else None,
+        })
+    return stats
+
+
+def close_clients():
+    """
+    Close all pooled clients and their connections.
+    """
+    with _lock:
+        for entry in _clients.values():
+            if entry.http_client is not None:
+                entry.http_client.close()
+        _clients.clear()
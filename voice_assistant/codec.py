@@ -0,0 +1,260 @@
+# voice_assistant/codec.py
+
+import functools
+import math
+import struct
+import wave
+
+import numpy as np
+
+# Twilio media streams carry 8 kHz, mono, 8-bit G.711 mu-law audio
+TWILIO_SAMPLE_RATE = 8000
+
+# 20 ms of 8 kHz mu-law, the frame size Twilio itself sends
+TWILIO_FRAME_BYTES = 160
+
+
+def _build_ulaw_decode_table():
+    """
+    Build the 256-entry G.711 mu-law to 16-bit PCM lookup table.
+
+    Returns:
+        np.ndarray: int16 array indexed by mu-law byte value.
+    """
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    magnitude = (((codes & 0x0F) << 3) + 0x84) << ((codes & 0x70) >> 4)
+    pcm = np.where(codes & 0x80, 0x84 - magnitude, magnitude - 0x84)
+    return pcm.astype(np.int16)
+
+
+ULAW_DECODE_TABLE = _build_ulaw_decode_table()
+
+# G.711 works on 14-bit samples
+_ULAW_BIAS = 0x21
+_ULAW_MAX_MAGNITUDE = 0x1FFF
+
+
+def ulaw_to_pcm16(data, out=None):
+    """
+    Decode mu-law bytes to 16-bit PCM samples.
+
+    Args:
+        data (bytes | bytearray | memoryview): The mu-law encoded audio.
+        out (np.ndarray, optional): Preallocated int16 array to decode into.
+
+    Returns:
+        np.ndarray: The decoded int16 samples (``out`` if it was given).
+    """
+    codes = np.frombuffer(data, dtype=np.uint8)
+    return np.take(ULAW_DECODE_TABLE, codes, out=out)
+
+
+def _build_ulaw_encode_table():
+    """
+    Build the 65536-entry 16-bit PCM to G.711 mu-law lookup table.
+
+    Returns:
+        np.ndarray: uint8 array indexed by the int16 sample's bits read as uint16.
+    """
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+    magnitude = np.minimum(np.abs(pcm) + _ULAW_BIAS, _ULAW_MAX_MAGNITUDE)
+    # frexp's exponent is the bit length of the biased magnitude (6 to 13)
+    exponent = np.frexp(magnitude)[1] - 6
+    mantissa = (magnitude >> (exponent + 1)) & 0x0F
+    codes = ~(((pcm < 0) << 7) | (exponent << 4) | mantissa) & 0xFF
+    return codes.astype(np.uint8)
+
+
+ULAW_ENCODE_TABLE = _build_ulaw_encode_table()
+
+
+def _as_pcm16(pcm):
+    if isinstance(pcm, np.ndarray):
+        return pcm.astype(np.int16, copy=False)
+    return np.frombuffer(pcm, dtype=np.int16)
+
+
+def pcm16_to_ulaw(pcm, out=None):
+    """
+    Encode 16-bit PCM samples as G.711 mu-law.
+
+    Args:
+        pcm (np.ndarray | bytes | memoryview): The int16 samples.
+        out (np.ndarray, optional): Preallocated uint8 array to encode into.
+
+    Returns:
+        bytes | np.ndarray: One mu-law byte per sample (``out`` if it was given).
+    """
+    indexes = _as_pcm16(pcm).view(np.uint16)
+    if out is not None:
+        return np.take(ULAW_ENCODE_TABLE, indexes, out=out)
+    return np.take(ULAW_ENCODE_TABLE, indexes).tobytes()
+
+
+@functools.lru_cache(maxsize=None)
+def _polyphase_filter(up, down, zero_crossings=10, beta=5.0):
+    """
+    Design the anti-aliasing filter for resampling by ``up / down``, split into its phases.
+
+    Returns:
+        tuple: ``(phases, half)``. ``phases`` is a float32 array of shape
+        (up, taps per phase) whose row ``p`` holds the taps ``p, p + up,
+        p + 2 * up, ...`` of the full filter; ``half`` is the filter's
+        half-length in taps, i.e. the delay to its centre.
+    """
+    half = zero_crossings * max(up, down)
+    cutoff = 1.0 / max(up, down)
+    n = np.arange(-half, half + 1)
+    taps = cutoff * np.sinc(cutoff * n) * np.kaiser(2 * half + 1, beta) * up
+    taps = np.concatenate((taps, np.zeros(-len(taps) % up)))
+    return taps.reshape(-1, up).T.astype(np.float32), half
+
+
+def resample(pcm, from_rate, to_rate, block=8192):
+    """
+    Change the sample rate of mono audio with a polyphase windowed-sinc filter.
+
+    Only the output samples are computed, each from one phase of the
+    filter, so 8 kHz to 16 kHz or 22.05 kHz to 8 kHz costs about twenty
+    multiply-adds per output sample.
+
+    Args:
+        pcm (np.ndarray | bytes | memoryview): int16 samples, or a float array.
+        from_rate (int): The sample rate of ``pcm``.
+        to_rate (int): The sample rate to produce.
+        block (int): Output samples computed per step, which bounds the temporary memory.
+
+    Returns:
+        np.ndarray: int16 samples for int16 or byte input, float32 for float input.
+    """
+    samples = pcm if isinstance(pcm, np.ndarray) else _as_pcm16(pcm)
+    if from_rate == to_rate:
+        return samples
+    divisor = math.gcd(from_rate, to_rate)
+    up, down = to_rate // divisor, from_rate // divisor
+    phases, half = _polyphase_filter(up, down)
+    taps = phases.shape[1]
+
+    # Zero padding on both sides stands in for the signal before and after the audio
+    padded = np.zeros(len(samples) + 2 * taps + half // up + 1, dtype=np.float32)
+    padded[taps:taps + len(samples)] = samples
+    count = -(-len(samples) * up // down)
+    out = np.empty(count, dtype=np.float32)
+    offsets = np.arange(taps)
+    for start in range(0, count, block):
+        # Output n sits at position n * down + half of the zero-stuffed, filtered signal
+        position = np.arange(start, min(start + block, count)) * down + half
+        indexes = (position // up + taps)[:, None] - offsets
+        out[start:start + len(position)] = np.einsum("nk,nk->n", padded[indexes], phases[position % up])
+
+    if samples.dtype.kind == "f":
+        return out
+    return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+
+def iter_frames(data, frame_bytes=TWILIO_FRAME_BYTES):
+    """
+    Slice audio into fixed-size frames without copying it.
+
+    Args:
+        data (bytes | bytearray | memoryview | np.ndarray): The audio.
+        frame_bytes (int): Bytes per frame; the last frame may be shorter.
+
+    Yields:
+        memoryview: One frame.
+    """
+    view = memoryview(data).cast("B")
+    for offset in range(0, len(view), frame_bytes):
+        yield view[offset:offset + frame_bytes]
+
+
+def write_wav(file_path, pcm, sample_rate=TWILIO_SAMPLE_RATE):
+    """
+    Write mono 16-bit PCM samples to a WAV file.
+
+    Args:
+        file_path (str): The path of the WAV file to write.
+        pcm (np.ndarray): The int16 samples.
+        sample_rate (int): The sample rate of the audio.
+
+    Returns:
+        str: The path of the written file.
+    """
+    with wave.open(file_path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.astype("<i2", copy=False).tobytes())
+    return file_path
+
+
+def wav_header(data_size, sample_rate=TWILIO_SAMPLE_RATE, channels=1, sample_width=2):
+    """
+    Build a 44-byte PCM WAV header.
+
+    Args:
+        data_size (int): Size of the sample data in bytes.
+        sample_rate (int): The sample rate of the audio.
+        channels (int): The number of channels.
+        sample_width (int): Bytes per sample.
+
+    Returns:
+        bytes: The RIFF/WAVE header.
+    """
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b"data", data_size,
+    )
+
+
+def pcm16_to_wav(pcm, sample_rate=TWILIO_SAMPLE_RATE):
+    """
+    Frame mono 16-bit PCM as an in-memory WAV file.
+
+    Args:
+        pcm (np.ndarray | bytes | memoryview): Little-endian int16 samples.
+        sample_rate (int): The sample rate of the audio.
+
+    Returns:
+        bytes: The WAV file contents.
+    """
+    data = memoryview(pcm).cast("B")
+    return wav_header(data.nbytes, sample_rate) + data
+
+
+def wav_to_pcm16(data):
+    """
+    Find the 16-bit PCM samples inside an in-memory WAV file, without copying them.
+
+    Args:
+        data (bytes | memoryview): The WAV file contents.
+
+    Returns:
+        tuple: (int16 samples viewing ``data``, sample rate, channels).
+
+    Raises:
+        ValueError: If the data is not 16-bit PCM WAV.
+    """
+    view = memoryview(data).cast("B")
+    if view[:4] != b"RIFF" or view[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(view):
+        chunk_id, size = struct.unpack_from("<4sI", view, offset)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack_from("<HHIIHH", view, body)
+        elif chunk_id == b"data":
+            if fmt is None or fmt[0] != 1 or fmt[5] != 16:
+                raise ValueError("Only 16-bit PCM WAV is supported")
+            # Streamed WAVs carry a placeholder size; the data runs to the end
+            end = min(body + size, len(view))
+            end -= (end - body) % 2
+            return np.frombuffer(view[body:end], dtype="<i2"), fmt[2], fmt[1]
+        # Chunks are padded to an even size
+        offset = body + size + (size & 1)
+    raise ValueError("WAV file has no data chunk")
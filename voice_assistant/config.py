@@ -6,6 +6,14 @@ from dotenv import load_dotenv
 # Load environment variables from the .env file
 load_dotenv()
 
+def _api_keys(name):
+    """
+    Read every key of a provider: NAME_API_KEYS (comma-separated), else NAME_API_KEY.
+    """
+    keys = [key.strip() for key in os.getenv(f"{name}_API_KEYS", "").split(",") if key.strip()]
+    single = os.getenv(f"{name}_API_KEY")
+    return keys or ([single] if single else [])
+
 class Config:
     """
     Configuration class to hold the model selection and API keys.
@@ -21,9 +29,20 @@ class Config:
         LOCAL_MODEL_PATH (str): Path to the local model.
     """
     # Model selection
-    TRANSCRIPTION_MODEL = 'groq'  # possible values: openai, groq, deepgram, fastwhisperapi
-    RESPONSE_MODEL = 'groq'  # possible values: openai, groq, ollama
+    TRANSCRIPTION_MODEL = os.getenv("TRANSCRIPTION_MODEL", 'groq')  # possible values: openai, groq, deepgram, fastwhisperapi
+    RESPONSE_MODEL = os.getenv("RESPONSE_MODEL", 'groq')  # possible values: openai, groq, ollama
     TTS_MODEL = 'cartesia'  # possible values: openai, deepgram, elevenlabs, melotts, cartesia
+    STREAMING_TRANSCRIPTION_MODEL = os.getenv("STREAMING_TRANSCRIPTION_MODEL") or None  # possible values: deepgram, None (batch TRANSCRIPTION_MODEL only)
+    # Providers tried, in order, when the one before fails or is slow; comma-separated
+    TRANSCRIPTION_FALLBACKS = [model for model in os.getenv("TRANSCRIPTION_FALLBACKS", "").split(",") if model]
+    RESPONSE_FALLBACKS = [model for model in os.getenv("RESPONSE_FALLBACKS", "").split(",") if model]
+
+    # Hedged provider requests (voice_assistant/provider_router.py)
+    HEDGE_PERCENTILE = 95  # a request slower than this percentile of its provider's recent latency is hedged
+    HEDGE_DEFAULT_DELAY = 1.0  # seconds, until a provider has HEDGE_MIN_SAMPLES latencies
+    HEDGE_MIN_DELAY = 0.2  # seconds; never hedge sooner than this
+    HEDGE_MIN_SAMPLES = 20
+    HEDGE_WINDOW = 200  # recent latencies kept per provider
 
     # currently using the MeloTTS for local models. here is how to get started:
     # https://github.com/myshell-ai/MeloTTS/blob/main/docs/install.md#linux-and-macos-install
@@ -41,12 +60,136 @@ class Config:
     LOCAL_MODEL_PATH = os.getenv("LOCAL_MODEL_PATH")
     CARTESIA_API_KEY = os.getenv("CARTESIA_API_KEY")
 
+    # Key pools (api_key_manager.py); set e.g. GROQ_API_KEYS=key1,key2 to spread load over several keys
+    API_KEYS = {
+        "openai": _api_keys("OPENAI"),
+        "groq": _api_keys("GROQ"),
+        "deepgram": _api_keys("DEEPGRAM"),
+        "elevenlabs": _api_keys("ELEVENLABS"),
+        "cartesia": _api_keys("CARTESIA"),
+    }
+    # Limits per key, per minute; providers and limits left out are not metered
+    API_KEY_RATE_LIMITS = {
+        "groq": {"requests_per_minute": 30, "tokens_per_minute": 30000},
+    }
+    API_KEY_MAX_WAIT = 2.0  # seconds to wait for a key with budget; then one goes over budget, never a rate-limited one
+    API_KEY_DEFAULT_COOLDOWN = 10.0  # seconds a rate-limited key rests when the provider gives no Retry-After
+
     # for serving the MeloTTS model
     TTS_PORT_LOCAL = 5150
+    LOCAL_TTS_WORKERS = int(os.getenv("LOCAL_TTS_WORKERS", 1))  # model instances, each synthesizing one request at a time
+    LOCAL_TTS_WARMUP_TEXT = "Hello! This is a warm-up."
+    LOCAL_TTS_BATCH_WINDOW = 0.01  # seconds concurrent sentences are collected into one batch
+    LOCAL_TTS_MAX_BATCH = 32  # sentences per batch at most
+    LOCAL_TTS_CACHE_MAX_BYTES = 64 * 1024 * 1024  # synthesized sentences kept in memory
 
     # temp file generated by the initial STT model
     INPUT_AUDIO = "test.mp3"
 
+    # Standalone voice server (server.py)
+    VOICE_SERVER_HOST = os.getenv("VOICE_SERVER_HOST", "0.0.0.0")
+    VOICE_SERVER_PORT = int(os.getenv("VOICE_SERVER_PORT", 5050))
+    VOICE_SERVER_WORKERS = int(os.getenv("VOICE_SERVER_WORKERS", os.cpu_count() or 1))
+
+    # Call transcripts and UI settings shared by the server workers and the Streamlit UI
+    SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "voice_sessions.db")
+    SYSTEM_PROMPT = "You are Verbi, an AI assistant. Engage in a helpful and engaging conversation with the user."
+    RESPONSE_LENGTH = 1  # default of the UI's "Response Length" slider (1-5)
+
+    # Live event feed for dashboards (/events)
+    EVENT_MAX_SUBSCRIBERS = 100
+    EVENT_SUBSCRIBER_BUFFER = 256  # events buffered per subscriber before the oldest are dropped
+    EVENT_KEEPALIVE_SECONDS = 15
+    EVENT_RELAY_INTERVAL = 0.5  # seconds between polls for other workers' events
+
+    # PDF knowledge base (pdf_processing.py)
+    PDF_INDEX_DIR = os.getenv("PDF_INDEX_DIR", "pdf_index_cache")  # persisted FAISS indexes and chunk embeddings
+    PDF_CHUNK_SIZE = 1000
+    PDF_CHUNK_OVERLAP = 100
+    PDF_EMBEDDING_MODEL = "models/embedding-001"
+    PDF_RETRIEVER_K = 5
+    PDF_INGEST_WORKERS = os.cpu_count() or 1  # processes parsing pages of a corpus
+    PDF_PAGES_PER_TASK = 16
+    PDF_EMBED_BATCH_SIZE = 100  # chunks per embedding request
+    PDF_EMBED_CONCURRENCY = 4  # embedding requests in flight
+    PDF_EMBED_RETRIES = 3
+
+    # Knowledge base consulted during calls (voice_assistant/retrieval.py)
+    KNOWLEDGE_BASE_PDFS = [path for path in os.getenv("KNOWLEDGE_BASE_PDFS", "").split(os.pathsep) if path]
+    RETRIEVAL_BUDGET = 0.15  # seconds a turn waits for passages before answering without them
+    RETRIEVAL_CACHE_SIZE = 256  # queries whose embeddings and results are kept
+
+    # Pooled provider HTTP clients
+    PROVIDER_TIMEOUT = 30.0  # seconds per request
+    PROVIDER_MAX_CONNECTIONS = 20  # per (provider, API key) client
+    PROVIDER_KEEPALIVE_EXPIRY = 300.0  # seconds an idle connection is kept open
+
+    # Pooled clients for the localhost services (FastWhisperAPI, the MeloTTS server)
+    FASTWHISPER_URL = os.getenv("FASTWHISPER_URL", "http://localhost:8000")
+    MELOTTS_URL = os.getenv("MELOTTS_URL", f"http://localhost:{TTS_PORT_LOCAL}")
+    LOCAL_SERVICE_TIMEOUT = 30.0  # seconds per request; synthesis and transcription can be slow on CPU
+    LOCAL_SERVICE_MAX_CONNECTIONS = 20
+    LOCAL_SERVICE_HEALTH_TTL = 30.0  # seconds a passed health check is trusted
+    LOCAL_SERVICE_HEALTH_RETRY = 2.0  # seconds before a failed health check is repeated
+
+    # Shared Cartesia TTS WebSockets
+    CARTESIA_POOL_SIZE = 4  # sockets shared by all calls
+    CARTESIA_HEALTH_CHECK_INTERVAL = 15  # seconds between pings
+    CARTESIA_CONNECT_ATTEMPTS = 3  # connection attempts before a send fails
+
+    # Cache of synthesized phrases (mu-law 8 kHz)
+    TTS_CACHE_MAX_BYTES = 32 * 1024 * 1024  # in-memory LRU budget
+    TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR")  # optional on-disk store, memory-mapped on load
+    TTS_CACHE_MAX_TEXT_CHARS = 120  # longer text is never cached
+    TTS_CACHE_MARK_FRAMES = 10  # Twilio mark every N cached frames (200 ms)
+    INTRO_MESSAGE = "Hello! I am Verbi, your AI assistant. How can I help you today?"
+    FALLBACK_MESSAGE = "Sorry, I didn't catch that. Could you say it again?"  # spoken when every provider failed
+    TTS_PREWARM_PHRASES = [
+        INTRO_MESSAGE,
+        FALLBACK_MESSAGE,
+        "Goodbye!",
+    ]
+
+    # Reply length budget; the UI's "Response Length" (1-5) is multiplied by this
+    WORDS_PER_RESPONSE_LENGTH = 10
+    TOKENS_PER_WORD = 1.4  # rough English average for the provider-side max_tokens
+    RESPONSE_TOKEN_HEADROOM = 40  # extra tokens so the last sentence can be finished
+
+    # Per-call conversation memory
+    SESSION_CONTEXT_TOKENS = 1500  # recent turns sent with every prompt
+    SESSION_SUMMARY_BATCH_TOKENS = 300  # turns past the window are summarized once they add up to this
+    SESSION_SUMMARY_MAX_TOKENS = 200  # length cap of the running summary
+
+    # Chunking of streamed LLM output for TTS
+    TTS_MIN_CLAUSE_CHARS = 20  # a first clause shorter than this waits for more text
+    TTS_MAX_CHUNK_CHARS = 200  # text without punctuation is cut at a word boundary
+
+    # Worker threads for blocking STT/LLM calls, shared by all calls
+    BLOCKING_WORKERS = 32
+    PER_CALL_BLOCKING_LIMIT = 2  # blocking jobs one call may have in flight
+
+    # Live transcription of call audio; TRANSCRIPTION_MODEL stays the fallback
+    DEEPGRAM_LIVE_URL = os.getenv("DEEPGRAM_LIVE_URL", "wss://api.deepgram.com/v1/listen")
+    DEEPGRAM_LIVE_MODEL = "nova-2"
+    DEEPGRAM_LIVE_ENDPOINTING_MS = 300
+    STREAMING_STT_FINAL_TIMEOUT = 0.5  # seconds to wait for the last words to become final
+
+    # Inbound Twilio call audio
+    MAX_UTTERANCE_SECONDS = 30  # size of the per-call ring buffer
+
+    # Streaming voice activity detection on inbound call frames
+    VAD_FRAME_MS = 20  # Twilio sends 20 ms media frames
+    VAD_THRESHOLD_DB = 9.0  # frame energy above the noise floor that counts as voiced
+    VAD_MIN_ENERGY_DB = 45.0  # absolute floor so digital silence never triggers speech
+    VAD_MIN_SPEECH_MS = 100  # voiced audio needed before a speech start is emitted
+    VAD_HANGOVER_MS = 200  # audio kept after the last voiced frame
+    VAD_END_OF_UTTERANCE_MS = 500  # silence that ends a turn
+    VAD_PREROLL_MS = 200  # audio kept before the first voiced frame
+    VAD_NOISE_ADAPT_RATE = 0.05  # how quickly the noise floor rises while silent
+
+    # Playback of replies on the call
+    PLAYBACK_MARK_GRACE = 2.0  # seconds past the end of a reply's audio to wait for Twilio's last mark
+
     @staticmethod
     def validate_config():
         """
@@ -65,6 +208,7 @@ class Config:
         Config._validate_api_key('TRANSCRIPTION_MODEL', 'openai', 'OPENAI_API_KEY')
         Config._validate_api_key('TRANSCRIPTION_MODEL', 'groq', 'GROQ_API_KEY')
         Config._validate_api_key('TRANSCRIPTION_MODEL', 'deepgram', 'DEEPGRAM_API_KEY')
+        Config._validate_api_key('STREAMING_TRANSCRIPTION_MODEL', 'deepgram', 'DEEPGRAM_API_KEY')
 
         Config._validate_api_key('RESPONSE_MODEL', 'openai', 'OPENAI_API_KEY')
         Config._validate_api_key('RESPONSE_MODEL', 'groq', 'GROQ_API_KEY')
@@ -84,5 +228,6 @@ class Config:
         
     @staticmethod
     def _validate_api_key(model_attr, model_value, api_key_attr):
-        if getattr(Config, model_attr) == model_value and not getattr(Config, api_key_attr):
+        provider_keys = Config.API_KEYS.get(model_value)
+        if getattr(Config, model_attr) == model_value and not (getattr(Config, api_key_attr) or provider_keys):
             raise ValueError(f"{api_key_attr} is required for {model_value} models")
\ No newline at end of file
@@ -0,0 +1,142 @@
+# voice_assistant/events.py
+
+import asyncio
+import logging
+import os
+import time
+
+from voice_assistant.config import Config
+
+# Event types
+CALL_STARTED = "call_started"
+CALL_ENDED = "call_ended"
+TRANSCRIPT = "transcript"
+MESSAGE = "message"
+BARGE_IN = "barge_in"
+DROPPED = "dropped"
+
+
+class Subscription:
+    """
+    One subscriber's bounded view of the event bus.
+
+    When the subscriber falls behind, the oldest buffered events are dropped
+    and a single ``dropped`` event tells it how many it missed, so a slow
+    reader costs the publisher nothing and its memory stays bounded.
+    """
+
+    def __init__(self, bus, max_events):
+        self.bus = bus
+        self.queue = asyncio.Queue(maxsize=max_events)
+        self.dropped = 0
+
+    def offer(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """
+        Wait for the next event.
+
+        Args:
+            timeout (float, optional): Seconds to wait before giving up.
+
+        Returns:
+            dict | None: The event, or None if ``timeout`` passed first.
+        """
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            return {"type": DROPPED, "count": dropped, "time": time.time()}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.subscribers.discard(self)
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for live call events.
+
+    ``publish`` never blocks and never waits for subscribers; every
+    subscriber has its own bounded buffer.
+    """
+
+    def __init__(self, max_subscribers=Config.EVENT_MAX_SUBSCRIBERS, buffer_size=Config.EVENT_SUBSCRIBER_BUFFER):
+        self.max_subscribers = max_subscribers
+        self.buffer_size = buffer_size
+        self.subscribers = set()
+        self.published = 0
+
+    def publish(self, event_type, stream_sid=None, **fields):
+        """
+        Publish an event to every subscriber.
+
+        Args:
+            event_type (str): One of the event type constants.
+            stream_sid (str, optional): The call the event belongs to.
+            **fields: Event-specific data.
+        """
+        event = {"type": event_type, "stream_sid": stream_sid, "time": time.time(), "worker": os.getpid(), **fields}
+        self.published += 1
+        for subscriber in self.subscribers:
+            subscriber.offer(event)
+
+    def subscribe(self):
+        """
+        Start receiving events.
+
+        Returns:
+            Subscription | None: The subscription, or None if the subscriber limit is reached.
+        """
+        if len(self.subscribers) >= self.max_subscribers:
+            return None
+        subscription = Subscription(self, self.buffer_size)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "buffered": sum(subscriber.queue.qsize() for subscriber in self.subscribers),
+        }
+
+
+async def relay_store_events(bus, store, interval=Config.EVENT_RELAY_INTERVAL):
+    """
+    Republish the calls and messages that other worker processes write to the store.
+
+    With several server workers, a dashboard is connected to only one of
+    them; this makes it see every call, ``interval`` seconds late at most.
+    Live transcripts are not stored and stay local to their worker.
+
+    Args:
+        bus (EventBus): This worker's bus.
+        store (SessionStore): The shared store.
+        interval (float): Seconds between polls.
+    """
+    worker = os.getpid()
+    last_call_event_id, last_message_id = await store.submit(store.last_ids)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            call_events, messages = await store.submit(store.changes_since, last_call_event_id, last_message_id,
+                                                       worker)
+        except Exception as e:
+            logging.warning(f"Failed to read events from the session store: {e}")
+            continue
+        for call_event in call_events:
+            kind = CALL_STARTED if call_event["kind"] == "started" else CALL_ENDED
+            bus.publish(kind, call_event["stream_sid"], worker=call_event["worker"])
+            last_call_event_id = call_event["id"]
+        for message in messages:
+            bus.publish(MESSAGE, message["stream_sid"], role=message["role"], content=message["content"],
+                        worker=message["worker"])
+            last_message_id = message["id"]
+
+event_bus = EventBus()
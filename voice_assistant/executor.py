@@ -0,0 +1,176 @@
+# voice_assistant/executor.py
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from voice_assistant.config import Config
+from voice_assistant.metrics import Gauge, registry
+
+# Shared worker threads for the blocking provider SDK calls (STT, LLM)
+_executor = ThreadPoolExecutor(max_workers=Config.BLOCKING_WORKERS, thread_name_prefix="voice-io")
+
+# Work beyond this limit waits on the event loop instead of piling up in the
+# executor queue, where it could no longer be cancelled. A slot is held until
+# the worker thread is done, even if the caller stopped waiting earlier.
+_global_slots = asyncio.Semaphore(Config.BLOCKING_WORKERS)
+_waiting = 0  # jobs waiting for a global slot
+
+
+class CallLimiter:
+    """
+    Caps how many blocking jobs a single call may have in flight at once.
+    """
+
+    def __init__(self, max_concurrent=Config.PER_CALL_BLOCKING_LIMIT):
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    async def acquire(self):
+        await self._slots.acquire()
+
+    def release(self):
+        self._slots.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def pending_jobs():
+    """
+    Return the number of blocking jobs waiting for a global slot.
+    """
+    return _waiting
+
+
+registry.register(Gauge("voice_blocking_queue_depth", "Blocking STT/LLM jobs waiting for a worker slot.",
+                        callback=pending_jobs))
+
+
+async def _acquire_slots(call_limiter):
+    global _waiting
+    if call_limiter is not None:
+        await call_limiter.acquire()
+    _waiting += 1
+    try:
+        await _global_slots.acquire()
+    except BaseException:
+        if call_limiter is not None:
+            call_limiter.release()
+        raise
+    finally:
+        _waiting -= 1
+
+
+def _release_slots(call_limiter):
+    _global_slots.release()
+    if call_limiter is not None:
+        call_limiter.release()
+
+
+def _submit(loop, call, call_limiter):
+    # Start ``call`` on a worker thread holding slots from _acquire_slots; they are
+    # released once the thread is done with it, not when the caller stops waiting
+    def release(_):
+        try:
+            loop.call_soon_threadsafe(_release_slots, call_limiter)
+        except RuntimeError:
+            # The event loop has shut down; its semaphores went with it
+            pass
+
+    try:
+        future = _executor.submit(call)
+    except BaseException:
+        _release_slots(call_limiter)
+        raise
+    future.add_done_callback(release)
+    return future
+
+
+async def run_blocking(func, *args, call_limiter=None, **kwargs):
+    """
+    Run a blocking function on the shared worker pool without stalling the event loop.
+
+    Args:
+        func (callable): The blocking function to run.
+        *args: Positional arguments for ``func``.
+        call_limiter (CallLimiter, optional): The calling call's own concurrency limit.
+        **kwargs: Keyword arguments for ``func``.
+
+    Returns:
+        The return value of ``func``.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    await _acquire_slots(call_limiter)
+    return await asyncio.wrap_future(_submit(loop, call, call_limiter))
+
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+async def iterate_blocking(gen_func, *args, call_limiter=None, **kwargs):
+    """
+    Iterate a blocking generator on the shared worker pool.
+
+    The generator runs in a worker thread and its items are handed back to the
+    event loop as they are produced. Closing the returned async generator (or
+    cancelling its consumer) stops the worker before its next item.
+
+    Args:
+        gen_func (callable): Function returning the blocking iterator.
+        *args: Positional arguments for ``gen_func``.
+        call_limiter (CallLimiter, optional): The calling call's own concurrency limit.
+        **kwargs: Keyword arguments for ``gen_func``.
+
+    Yields:
+        The items produced by the iterator.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def hand_over(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # The event loop has shut down; nobody is listening any more
+            stop.set()
+
+    def produce():
+        iterator = gen_func(*args, **kwargs)
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    break
+                hand_over(item)
+        except Exception as e:
+            hand_over(_Failure(e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            hand_over(_DONE)
+
+    await _acquire_slots(call_limiter)
+    _submit(loop, produce, call_limiter)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
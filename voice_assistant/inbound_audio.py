@@ -0,0 +1,135 @@
+# voice_assistant/inbound_audio.py
+
+import base64
+
+import numpy as np
+
+from voice_assistant.codec import TWILIO_SAMPLE_RATE, ulaw_to_pcm16
+from voice_assistant.config import Config
+from voice_assistant.vad import StreamingVAD
+
+
+class PCMRingBuffer:
+    """
+    Fixed-size ring buffer of 16-bit PCM samples.
+
+    The backing array is allocated once; writes wrap around and positions are
+    tracked as absolute sample counts so callers can slice out any range that
+    has not been overwritten yet.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.int16)
+        self.total_written = 0
+
+    def write_ulaw(self, data):
+        """
+        Decode mu-law bytes straight into the ring.
+
+        Args:
+            data (bytes): The mu-law encoded audio.
+
+        Returns:
+            tuple: The absolute (start, end) sample positions that were written.
+        """
+        start = self.total_written
+        count = len(data)
+        if count > self.capacity:
+            # Only the newest samples would survive the wrap anyway
+            data = data[-self.capacity:]
+            start += count - self.capacity
+            count = self.capacity
+
+        offset = start % self.capacity
+        first = min(count, self.capacity - offset)
+        view = memoryview(data)
+        ulaw_to_pcm16(view[:first], out=self.buffer[offset:offset + first])
+        if first < count:
+            ulaw_to_pcm16(view[first:], out=self.buffer[:count - first])
+
+        self.total_written = start + count
+        return start, self.total_written
+
+    def read(self, start, end):
+        """
+        Copy the samples between two absolute positions out of the ring.
+
+        Args:
+            start (int): Absolute position of the first sample.
+            end (int): Absolute position one past the last sample.
+
+        Returns:
+            np.ndarray: The samples, clipped to what is still held in the ring.
+        """
+        start = max(start, self.total_written - self.capacity, 0)
+        end = min(end, self.total_written)
+        if end <= start:
+            return np.zeros(0, dtype=np.int16)
+
+        offset = start % self.capacity
+        count = end - start
+        if offset + count <= self.capacity:
+            return self.buffer[offset:offset + count].copy()
+        first = self.capacity - offset
+        return np.concatenate((self.buffer[offset:], self.buffer[:count - first]))
+
+
+class InboundAudioStream:
+    """
+    Per-call pipeline that turns Twilio ``media`` payloads into speech events.
+
+    Each payload is decoded into a preallocated ring buffer and run through a
+    StreamingVAD. Speech end events can then be turned into utterances with
+    ``read_utterance``, which copies the speech segment out of the ring.
+    """
+
+    def __init__(self, sample_rate=TWILIO_SAMPLE_RATE,
+                 max_utterance_seconds=Config.MAX_UTTERANCE_SECONDS, vad=None):
+        self.sample_rate = sample_rate
+        # Leave headroom for the VAD preroll and end-of-utterance wait
+        self.ring = PCMRingBuffer(int(sample_rate * (max_utterance_seconds + 2)))
+        self.vad = vad or StreamingVAD(sample_rate=sample_rate,
+                                       max_speech_ms=max_utterance_seconds * 1000)
+
+    def feed(self, payload):
+        """
+        Consume one base64 ``media.payload`` from Twilio.
+
+        Args:
+            payload (str): The base64 encoded mu-law audio.
+
+        Returns:
+            list: The VADEvent tuples completed by this frame.
+        """
+        return self.feed_ulaw(base64.b64decode(payload))
+
+    def feed_ulaw(self, data):
+        """
+        Consume one frame of already decoded mu-law audio.
+
+        Args:
+            data (bytes): The raw mu-law audio.
+
+        Returns:
+            list: The VADEvent tuples completed by this frame.
+        """
+        start, end = self.ring.write_ulaw(data)
+        offset = start % self.ring.capacity
+        if offset + (end - start) <= self.ring.capacity:
+            frame = self.ring.buffer[offset:offset + (end - start)]
+        else:
+            frame = self.ring.read(start, end)
+        return self.vad.process(frame)
+
+    def read_utterance(self, event):
+        """
+        Copy the audio of a finished utterance out of the ring buffer.
+
+        Args:
+            event (VADEvent): A SPEECH_END event returned by ``feed``.
+
+        Returns:
+            np.ndarray: The int16 samples of the utterance.
+        """
+        return self.ring.read(event.start, event.end)
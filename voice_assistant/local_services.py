@@ -0,0 +1,180 @@
+# voice_assistant/local_services.py
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+
+import httpx
+
+from voice_assistant.config import Config
+
+
+class LocalServiceUnavailable(Exception):
+    """
+    Raised when a localhost service does not pass its health check.
+    """
+
+
+class MultipartUpload:
+    """
+    A multipart/form-data request body sent piece by piece.
+
+    The file is sent straight from the buffers it already lives in, e.g. a
+    WAV header and the caller's PCM, instead of being copied into one body.
+    Pass ``iter_chunks()`` (or ``aiter_chunks()`` on an async client) as
+    ``content=`` together with ``headers``.
+    """
+
+    def __init__(self, fields, file_field, filename, content_type, chunks):
+        boundary = uuid.uuid4().hex
+        head = "".join(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                       f'{_form_value(value)}\r\n' for name, value in fields.items())
+        head += (f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+                 f'Content-Type: {content_type}\r\n\r\n')
+        self.parts = [head.encode("utf-8"), *(memoryview(chunk).cast("B") for chunk in chunks),
+                      f"\r\n--{boundary}--\r\n".encode("utf-8")]
+        self.headers = {
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+            "Content-Length": str(sum(part.nbytes if isinstance(part, memoryview) else len(part)
+                                      for part in self.parts)),
+        }
+
+    def iter_chunks(self):
+        yield from self.parts
+
+    async def aiter_chunks(self):
+        for part in self.parts:
+            yield part
+
+
+def _form_value(value):
+    # Form fields as httpx would encode them
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=Config.LOCAL_SERVICE_MAX_CONNECTIONS,
+        max_keepalive_connections=Config.LOCAL_SERVICE_MAX_CONNECTIONS,
+        keepalive_expiry=Config.PROVIDER_KEEPALIVE_EXPIRY,
+    )
+
+
+class LocalService:
+    """
+    Keep-alive HTTP clients and a cached health check for one localhost service.
+
+    The synchronous client serves the worker threads and the async client
+    the event loop; each keeps its connections open between requests. A
+    passed health check is trusted for ``health_ttl`` seconds, and a failed
+    one is not repeated for ``health_retry`` seconds, so the check costs a
+    request now and then instead of one per call.
+    """
+
+    def __init__(self, name, base_url, health_path, health_ttl=Config.LOCAL_SERVICE_HEALTH_TTL,
+                 health_retry=Config.LOCAL_SERVICE_HEALTH_RETRY):
+        self.name = name
+        self.base_url = base_url
+        self.health_path = health_path
+        self.health_ttl = health_ttl
+        self.health_retry = health_retry
+        self.healthy = None
+        self.checked_at = 0.0
+        self.requests = 0
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        """
+        Return the synchronous client, creating it on first use.
+        """
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(base_url=self.base_url, limits=_limits(),
+                                                timeout=httpx.Timeout(Config.LOCAL_SERVICE_TIMEOUT, connect=2.0))
+        self.requests += 1
+        return self._client
+
+    def async_client(self):
+        """
+        Return the async client, creating it on first use. Use it from one event loop only.
+        """
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(base_url=self.base_url, limits=_limits(),
+                                                   timeout=httpx.Timeout(Config.LOCAL_SERVICE_TIMEOUT, connect=2.0))
+        self.requests += 1
+        return self._async_client
+
+    def _cached_health(self):
+        if self.healthy is None:
+            return None
+        age = time.monotonic() - self.checked_at
+        return self.healthy if age < (self.health_ttl if self.healthy else self.health_retry) else None
+
+    def _record_health(self, response=None, error=None):
+        self.healthy = error is None and response.status_code == 200
+        self.checked_at = time.monotonic()
+        if not self.healthy:
+            logging.warning(f"{self.name} failed its health check: {error or response.status_code}")
+
+    def check(self):
+        """
+        Raise LocalServiceUnavailable unless the service is up, using the cached result if fresh.
+        """
+        healthy = self._cached_health()
+        if healthy is None:
+            try:
+                self._record_health(self.client().get(self.health_path))
+            except httpx.HTTPError as e:
+                self._record_health(error=e)
+            healthy = self.healthy
+        if not healthy:
+            raise LocalServiceUnavailable(f"{self.name} is not running")
+
+    async def async_check(self):
+        """
+        Like ``check``, without blocking the event loop.
+        """
+        healthy = self._cached_health()
+        if healthy is None:
+            try:
+                self._record_health(await self.async_client().get(self.health_path))
+            except httpx.HTTPError as e:
+                self._record_health(error=e)
+            healthy = self.healthy
+        if not healthy:
+            raise LocalServiceUnavailable(f"{self.name} is not running")
+
+    def stats(self):
+        return {
+            "service": self.name,
+            "url": self.base_url,
+            "healthy": self.healthy,
+            "requests": self.requests,
+        }
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+fastwhisper = LocalService("FastWhisperAPI", Config.FASTWHISPER_URL, "/info")
+melotts = LocalService("MeloTTS", Config.MELOTTS_URL, "/stats")
+
+
+def local_service_stats():
+    return [fastwhisper.stats(), melotts.stats()]
+
+
+async def close_local_services():
+    await asyncio.gather(fastwhisper.aclose(), melotts.aclose())
@@ -1,7 +1,20 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import queue
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+
+import numpy as np
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from melo.api import TTS
 from config import Config
+from codec import TWILIO_SAMPLE_RATE, pcm16_to_ulaw, resample, wav_header
 import torch
 import uuid
 
@@ -10,7 +23,7 @@ app = FastAPI()
 class TextToSpeechRequest(BaseModel):
     """
     Model representing a text-to-speech request.
-    
+
     Attributes:
         text (str): The text to convert to speech.
         language (str): The language of the text.
@@ -24,10 +37,42 @@ class TextToSpeechRequest(BaseModel):
     speed: float = 1.0
     filename: str = Field(default_factory=lambda: f"{uuid.uuid4()}.wav")
 
+class AudioFormat(str, Enum):
+    """
+    Encodings of the streamed audio.
+
+    ``wav`` and ``pcm_s16le`` keep the model's sample rate; ``ulaw_8000`` is
+    what Twilio media streams carry.
+    """
+    wav = "wav"
+    pcm_s16le = "pcm_s16le"
+    ulaw_8000 = "ulaw_8000"
+
+MEDIA_TYPES = {
+    AudioFormat.wav: "audio/wav",
+    AudioFormat.pcm_s16le: "audio/L16",
+    AudioFormat.ulaw_8000: "audio/basic",
+}
+
+class StreamAudioRequest(BaseModel):
+    """
+    Model representing a streaming text-to-speech request.
+
+    Attributes:
+        text (str): The text to convert to speech.
+        accent (str): The accent to use for the speech.
+        speed (float): The speed of the speech.
+        format (AudioFormat): The encoding of the returned audio.
+    """
+    text: str
+    accent: str = 'EN-US'
+    speed: float = 1.0
+    format: AudioFormat = AudioFormat.ulaw_8000
+
 def get_device():
     """
     Determine the appropriate device for running the TTS model.
-    
+
     Returns:
         str: The device to use ('cuda', 'mps', or 'cpu').
     """
@@ -38,10 +83,202 @@ def get_device():
     else:
         return 'cpu'
 
-# Initialize the TTS model
+# Initialize the TTS models; each worker thread synthesizes with one of them at a time
 device = get_device()  # Determine the appropriate device
-model = TTS(language='EN', device=device)
+models = queue.Queue()
+for _ in range(Config.LOCAL_TTS_WORKERS):
+    models.put(TTS(language='EN', device=device))
+model = models.queue[0]
 speaker_ids = model.hps.data.spk2id
+sample_rate = model.hps.data.sampling_rate
+executor = ThreadPoolExecutor(max_workers=Config.LOCAL_TTS_WORKERS, thread_name_prefix="melotts")
+
+
+def synthesize(text, speaker_id, speed=1.0):
+    """
+    Synthesize text with the next free model.
+
+    Returns:
+        np.ndarray: float32 samples at ``sample_rate``.
+    """
+    tts = models.get()
+    try:
+        # Without an output path MeloTTS returns the samples instead of writing a file
+        return tts.tts_to_file(text, speaker_id, None, speed=speed, quiet=True)
+    finally:
+        models.put(tts)
+
+
+def encode_audio(audio, audio_format):
+    """
+    Encode float samples from the model in the requested format.
+
+    Args:
+        audio (np.ndarray): float32 samples at ``sample_rate``.
+        audio_format (AudioFormat): The target encoding.
+
+    Returns:
+        bytes: The encoded audio, without any container header.
+    """
+    if audio_format == AudioFormat.ulaw_8000:
+        audio = resample(audio.astype(np.float32, copy=False), sample_rate, TWILIO_SAMPLE_RATE)
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    if audio_format == AudioFormat.ulaw_8000:
+        return pcm16_to_ulaw(pcm)
+    return pcm.tobytes()
+
+
+class SynthesisScheduler:
+    """
+    Queue in front of the models that coalesces concurrent requests.
+
+    Sentences submitted within ``window`` seconds of each other form one
+    batch. A sentence already cached or being synthesized is not synthesized
+    again, whichever request asked for it first. Waiting sentences go to the
+    models earliest position first, so every concurrent request gets its
+    first sentence before anyone gets their later ones. Finished sentences
+    are kept in an LRU bounded by bytes, keyed by (text, accent, speed).
+    """
+
+    def __init__(self, window=Config.LOCAL_TTS_BATCH_WINDOW, max_batch=Config.LOCAL_TTS_MAX_BATCH,
+                 cache_max_bytes=Config.LOCAL_TTS_CACHE_MAX_BYTES, workers=Config.LOCAL_TTS_WORKERS):
+        self.window = window
+        self.max_batch = max_batch
+        self.cache_max_bytes = cache_max_bytes
+        self.workers = workers
+        self.cache = OrderedDict()
+        self.cache_bytes = 0
+        self.in_flight = {}
+        self.queue = None
+        self.slots = None
+        self.waiting = []  # heap of (position, order, key)
+        self._order = itertools.count()
+        self._task = None
+        self.synthesizing = 0
+        self.batches = 0
+        self.batched_sentences = 0
+        self.largest_batch = 0
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.audio_seconds = 0.0
+        self.started = time.process_time()
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.workers)
+        self._task = asyncio.create_task(self._run())
+
+    def submit(self, text, accent, speed, position=0):
+        """
+        Ask for one sentence.
+
+        Args:
+            text (str): The sentence.
+            accent (str): A key of ``speaker_ids``.
+            speed (float): The speed of the speech.
+            position (int): Its position in the request; earlier positions are synthesized first.
+
+        Returns:
+            asyncio.Future: Resolves to float32 samples at ``sample_rate``. It may be
+            shared with other requests, so await it through ``asyncio.shield``.
+        """
+        key = (" ".join(text.split()), accent, speed)
+        future = asyncio.get_running_loop().create_future()
+        audio = self.cache.get(key)
+        if audio is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            future.set_result(audio)
+            return future
+        shared = self.in_flight.get(key)
+        if shared is not None:
+            self.coalesced += 1
+            return shared
+        self.misses += 1
+        self.in_flight[key] = future
+        self.queue.put_nowait((position, next(self._order), key))
+        return future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.waiting:
+                heapq.heappush(self.waiting, await self.queue.get())
+                # Gather what arrives within the window into the same batch
+                deadline = loop.time() + self.window
+                while len(self.waiting) < self.max_batch:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        heapq.heappush(self.waiting, await asyncio.wait_for(self.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                self.batches += 1
+                self.batched_sentences += len(self.waiting)
+                self.largest_batch = max(self.largest_batch, len(self.waiting))
+            await self.slots.acquire()
+            # Sentences that arrived while every model was busy compete for this slot too
+            while not self.queue.empty():
+                heapq.heappush(self.waiting, self.queue.get_nowait())
+            _, _, key = heapq.heappop(self.waiting)
+            text, accent, speed = key
+            self.synthesizing += 1
+            inference = loop.run_in_executor(executor, synthesize, text, speaker_ids[accent], speed)
+            inference.add_done_callback(functools.partial(self._finish, key))
+
+    def _finish(self, key, inference):
+        self.slots.release()
+        self.synthesizing -= 1
+        future = self.in_flight.pop(key)
+        if inference.exception() is not None:
+            future.set_exception(inference.exception())
+            return
+        audio = inference.result()
+        self.audio_seconds += len(audio) / sample_rate
+        self.cache[key] = audio
+        self.cache_bytes += audio.nbytes
+        while self.cache_bytes > self.cache_max_bytes and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.cache_bytes -= evicted.nbytes
+        future.set_result(audio)
+
+    def stats(self):
+        cpu_seconds = time.process_time() - self.started
+        return {
+            "queue_depth": (self.queue.qsize() if self.queue else 0) + len(self.waiting),
+            "synthesizing": self.synthesizing,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_sentences / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "cache_hits": self.hits,
+            "coalesced": self.coalesced,
+            "synthesized": self.misses,
+            "cache_entries": len(self.cache),
+            "cache_bytes": self.cache_bytes,
+            "audio_seconds": self.audio_seconds,
+            "cpu_seconds": cpu_seconds,
+            "audio_seconds_per_cpu_second": self.audio_seconds / cpu_seconds if cpu_seconds else 0.0,
+        }
+
+
+scheduler = SynthesisScheduler()
+
+
+@app.on_event("startup")
+async def warm_up_models():
+    # The first inference pays for lazy initialization; pay it before the first caller does
+    loop = asyncio.get_running_loop()
+    speaker_id = next(iter(speaker_ids.values()))
+    await asyncio.gather(*(loop.run_in_executor(executor, synthesize, Config.LOCAL_TTS_WARMUP_TEXT, speaker_id)
+                           for _ in range(Config.LOCAL_TTS_WORKERS)))
+    scheduler.start()
+
+
+@app.get("/stats")
+async def scheduler_stats():
+    return scheduler.stats()
 
 
 @app.post("/generate-audio/")
@@ -54,24 +291,65 @@ def generate_audio(request: TextToSpeechRequest):
 
     Returns:
         dict: A dictionary containing a message and the file path of the generated audio.
-    
+
     Raises:
         HTTPException: If the specified accent is invalid or if there is an error during audio generation.
     """
     if request.accent not in speaker_ids:
         raise HTTPException(status_code=400, detail="Invalid accent specified")
-    
+
     try:
         # Use the provided filename or generate a unique one
         output_filename = request.filename
-        
+
         # Generate the audio file
-        model.tts_to_file(request.text, speaker_ids[request.accent], output_filename, speed=request.speed)
-        
+        tts = models.get()
+        try:
+            tts.tts_to_file(request.text, speaker_ids[request.accent], output_filename, speed=request.speed)
+        finally:
+            models.put(tts)
+
         return {"message": "Audio file generated successfully", "file_path": output_filename}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@app.post("/stream-audio/")
+async def stream_audio(request: StreamAudioRequest):
+    """
+    Stream speech for the given text, sentence by sentence, without touching the disk.
+
+    All sentences go to the scheduler at once and are synthesized in
+    parallel; they are sent in order as they become ready, so the first
+    audio arrives after one sentence of inference rather than the whole text.
+
+    Args:
+        request (StreamAudioRequest): The request containing text and other parameters.
+
+    Returns:
+        StreamingResponse: The audio in ``request.format``.
+
+    Raises:
+        HTTPException: If the specified accent is invalid.
+    """
+    if request.accent not in speaker_ids:
+        raise HTTPException(status_code=400, detail="Invalid accent specified")
+    pieces = TTS.split_sentences_into_pieces(request.text, model.language, quiet=True)
+    sentences = [scheduler.submit(piece, request.accent, request.speed, position)
+                 for position, piece in enumerate(pieces)]
+
+    async def audio_chunks():
+        loop = asyncio.get_running_loop()
+        if request.format == AudioFormat.wav:
+            # The length is unknown while streaming; players read to the end of the stream
+            yield wav_header(0xFFFFFFFF - 36, sample_rate)
+        for sentence in sentences:
+            # Shielded: other requests may be waiting for the same sentence
+            audio = await asyncio.shield(sentence)
+            yield await loop.run_in_executor(None, encode_audio, audio, request.format)
+
+    return StreamingResponse(audio_chunks(), media_type=MEDIA_TYPES[request.format])
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=Config.TTS_PORT_LOCAL)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=Config.TTS_PORT_LOCAL)
@@ -1,5 +1,5 @@
-import requests
-from voice_assistant.config import Config
+import httpx
+from voice_assistant.local_services import melotts
 
 
 def generate_audio_file_melotts(text, language='EN', accent='EN-US', speed=1.0, filename=None):
@@ -16,9 +16,6 @@ def generate_audio_file_melotts(text, language='EN', accent='EN-US', speed=1.0,
     Returns:
         dict: A dictionary containing the message and the file path of the generated audio.
     """
-    # Define the API endpoint
-    url = f"http://localhost:{Config.TTS_PORT_LOCAL}/generate-audio/"
-
     # Define the payload
     payload = {
         "text": text,
@@ -30,13 +27,8 @@ def generate_audio_file_melotts(text, language='EN', accent='EN-US', speed=1.0,
     if filename:
         payload["filename"] = filename
 
-    # Set the headers
-    headers = {
-        "Content-Type": "application/json"
-    }
-
-    # Make the POST request
-    response = requests.post(url, json=payload, headers=headers)
+    # Make the POST request on the pooled keep-alive connection
+    response = melotts.client().post("/generate-audio/", json=payload)
 
     # Check the response
     if response.status_code == 200:
@@ -44,6 +36,54 @@ def generate_audio_file_melotts(text, language='EN', accent='EN-US', speed=1.0,
     else:
         response.raise_for_status()
 
+def stream_audio_melotts(text, accent='EN-US', speed=1.0, audio_format='ulaw_8000', chunk_size=4096):
+    """
+    Stream speech for the given text from the FastAPI endpoint, without writing a file.
+
+    Args:
+        text (str): The text to convert to speech.
+        accent (str): The accent to use for the speech. Default is 'EN-US'.
+        speed (float): The speed of the speech. Default is 1.0.
+        audio_format (str): 'ulaw_8000' (Twilio), 'pcm_s16le' or 'wav'. Default is 'ulaw_8000'.
+        chunk_size (int): Bytes per yielded chunk at most.
+
+    Yields:
+        bytes: The audio, as the server produces it.
+    """
+    payload = {
+        "text": text,
+        "accent": accent,
+        "speed": speed,
+        "format": audio_format
+    }
+
+    with melotts.client().stream("POST", "/stream-audio/", json=payload) as response:
+        response.raise_for_status()
+        yield from response.iter_bytes(chunk_size=chunk_size)
+
+async def async_stream_audio_melotts(text, accent='EN-US', speed=1.0, audio_format='ulaw_8000', chunk_size=4096):
+    """
+    Stream speech for the given text from the FastAPI endpoint on the event loop.
+
+    Takes the same arguments as ``stream_audio_melotts``; the health check
+    result is cached, so it rarely costs a request.
+
+    Yields:
+        bytes: The audio, as the server produces it.
+    """
+    await melotts.async_check()
+    payload = {
+        "text": text,
+        "accent": accent,
+        "speed": speed,
+        "format": audio_format
+    }
+
+    async with melotts.async_client().stream("POST", "/stream-audio/", json=payload) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes(chunk_size=chunk_size):
+            yield chunk
+
 # Example usage of the function
 if __name__ == "__main__":
     try:
@@ -56,7 +96,7 @@ if __name__ == "__main__":
         )
         print("Audio file generated successfully")
         print("File path:", result.get("file_path"))
-    except requests.HTTPError as http_err:
+    except httpx.HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")
     except Exception as err:
         print(f"Other error occurred: {err}")
\ No newline at end of file
@@ -0,0 +1,260 @@
+# voice_assistant/metrics.py
+
+import asyncio
+import bisect
+import threading
+import time
+
+# Latency buckets in seconds, sized for the stages of a phone turn
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+# Event-loop lag buckets; a 20 ms media frame that waits 10 ms is already late
+LOOP_LAG_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+class Counter:
+    """
+    A monotonically increasing count, optionally split by labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self.values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge:
+    """
+    A value that goes up and down. With a ``callback`` it is read at scrape time.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def samples(self):
+        value = self.callback() if self.callback is not None else self.value
+        yield f"{self.name} {value}"
+
+
+class Histogram:
+    """
+    A distribution of observed values in fixed cumulative buckets, optionally split by labels.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = [(label_values, list(counts)) for label_values, counts in self.series.items()]
+        for label_values, counts in series:
+            names = self.labels + ("le",)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(names, label_values + (bound,))} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {counts[-1]:.6f}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    The metrics exposed by this process.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The scrape body.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+turn_stage_seconds = registry.register(Histogram(
+    "voice_turn_stage_seconds", "Time from the end of caller speech until each stage of a turn.", ("stage",)))
+turn_span_seconds = registry.register(Histogram(
+    "voice_turn_span_seconds", "Duration of the provider steps of a turn.", ("span",)))
+turns_total = registry.register(Counter(
+    "voice_turns_total", "Turns handled, by outcome.", ("outcome",)))
+provider_errors_total = registry.register(Counter(
+    "voice_provider_errors_total", "Failed provider requests.", ("stage", "provider")))
+active_calls = registry.register(Gauge(
+    "voice_active_calls", "Calls with an open Twilio media stream."))
+event_loop_lag_seconds = registry.register(Histogram(
+    "voice_event_loop_lag_seconds", "How late the event loop woke up a sleeping task.",
+    buckets=LOOP_LAG_BUCKETS))
+
+# Stages of a turn, in the order they happen
+SPEECH_END = "speech_end"
+STT_DONE = "stt_done"
+RETRIEVAL_DONE = "retrieval_done"
+LLM_FIRST_TOKEN = "llm_first_token"
+LLM_DONE = "llm_done"
+TTS_REQUEST_SENT = "tts_request_sent"
+TTS_FIRST_BYTE = "tts_first_byte"
+FIRST_FRAME_SENT = "first_frame_sent"
+LAST_FRAME_SENT = "last_frame_sent"
+
+# Spans reported on their own: name -> (from stage, to stage)
+SPANS = {
+    "stt": (SPEECH_END, STT_DONE),
+    "retrieval": (STT_DONE, RETRIEVAL_DONE),
+    "llm_first_token": (STT_DONE, LLM_FIRST_TOKEN),
+    "llm": (STT_DONE, LLM_DONE),
+    "tts_first_byte": (TTS_REQUEST_SENT, TTS_FIRST_BYTE),
+    "voice_to_voice": (SPEECH_END, FIRST_FRAME_SENT),
+    "playback_send": (FIRST_FRAME_SENT, LAST_FRAME_SENT),
+}
+
+
+class TurnTimer:
+    """
+    Records when each stage of one turn was reached.
+
+    Only the first time a stage is marked counts, so marking is safe in hot
+    loops. ``finish`` reports the stages and spans to the histograms once.
+    """
+
+    __slots__ = ("stages", "finished")
+
+    def __init__(self, start_stage=SPEECH_END):
+        self.stages = {start_stage: time.perf_counter()}
+        self.finished = False
+
+    def mark(self, stage):
+        if stage not in self.stages:
+            self.stages[stage] = time.perf_counter()
+
+    def elapsed(self, start, end):
+        """
+        Seconds between two stages, or None if either was not reached.
+        """
+        if start not in self.stages or end not in self.stages:
+            return None
+        return self.stages[end] - self.stages[start]
+
+    def finish(self, outcome):
+        """
+        Report the turn.
+
+        Args:
+            outcome (str): How the turn ended, e.g. 'completed' or 'interrupted'.
+        """
+        if self.finished:
+            return
+        self.finished = True
+        turns_total.inc(outcome)
+        started = self.stages.get(SPEECH_END)
+        if started is not None:
+            for stage, reached in self.stages.items():
+                if stage != SPEECH_END:
+                    turn_stage_seconds.observe(reached - started, stage)
+        for span, (start, end) in SPANS.items():
+            elapsed = self.elapsed(start, end)
+            if elapsed is not None:
+                turn_span_seconds.observe(elapsed, span)
+
+
+async def monitor_event_loop_lag(interval=0.1):
+    """
+    Measure event-loop lag until cancelled.
+
+    Sleeps for ``interval`` over and over and records how much later than
+    asked for the loop got back to it. Anything blocking the loop shows up here.
+
+    Args:
+        interval (float): Seconds between samples.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag_seconds.observe(max(0.0, loop.time() - started - interval))
+
+
+async def timed_stream(stream, timer, first_stage, last_stage):
+    """
+    Pass an async stream through, marking its first item and its end on a TurnTimer.
+
+    Args:
+        stream (AsyncIterable): The stream to time.
+        timer (TurnTimer): The turn's timer.
+        first_stage (str): Stage marked when the first item arrives.
+        last_stage (str): Stage marked when the stream is exhausted.
+
+    Yields:
+        The items of ``stream``.
+    """
+    try:
+        async for item in stream:
+            timer.mark(first_stage)
+            yield item
+        timer.mark(last_stage)
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,142 @@
+# voice_assistant/playback.py
+
+import asyncio
+import logging
+import uuid
+
+from voice_assistant.config import Config
+
+# Twilio plays 8 kHz mu-law: one byte per sample, 8 bytes per millisecond
+_ULAW_BYTES_PER_MS = 8
+
+
+class PlaybackTracker:
+    """
+    Tracks how much of one spoken reply the caller has actually heard.
+
+    Every audio frame sent to Twilio is followed by a ``mark`` named after the
+    amount of audio sent so far. Twilio echoes a mark back once playback
+    reaches it, which moves ``played_ms`` forward. With Cartesia word
+    timestamps this maps to the words heard; without them the heard share of
+    the text is estimated from the share of audio played. The whole text
+    counts as heard only once the mark after the last frame comes back.
+    """
+
+    def __init__(self, text=""):
+        self.mark_prefix = uuid.uuid4().hex[:8]
+        self.text = text
+        self.sent_ms = 0.0
+        self.played_ms = 0.0
+        self.words = []  # (word, end_ms) pairs from Cartesia timestamps
+        self.generation_done = False
+        self.interrupted = False
+        self._mark_received = asyncio.Event()
+
+    def add_text(self, chunk):
+        """
+        Record a chunk of the reply text as it is sent for synthesis.
+        """
+        self.text = f"{self.text} {chunk}" if self.text else chunk
+
+    def add_word_timestamps(self, word_timestamps, offset_ms=0.0):
+        """
+        Record the word timings from a Cartesia ``timestamps`` message.
+
+        Args:
+            word_timestamps (dict): Holds parallel ``words`` and ``end`` (seconds) lists.
+            offset_ms (float): Audio already sent before the context started.
+        """
+        ends = word_timestamps.get("end", [])
+        for word, end in zip(word_timestamps.get("words", []), ends):
+            self.words.append((word, offset_ms + end * 1000))
+
+    def add_untimed_words(self, text, start_ms, end_ms):
+        """
+        Record words played without timestamps (e.g. cached audio), spread evenly.
+
+        Args:
+            text (str): The text that was played.
+            start_ms (float): Where its audio starts.
+            end_ms (float): Where its audio ends.
+        """
+        words = text.split()
+        step = (end_ms - start_ms) / len(words) if words else 0.0
+        for index, word in enumerate(words, start=1):
+            self.words.append((word, start_ms + index * step))
+
+    def audio_sent(self, payload):
+        """
+        Account for an audio frame sent to Twilio and name the mark that follows it.
+
+        Args:
+            payload (str): The base64 mu-law payload that was sent.
+
+        Returns:
+            str: The mark name to send after the frame.
+        """
+        audio_bytes = len(payload) * 3 // 4 - payload[-2:].count("=")
+        self.sent_ms += audio_bytes / _ULAW_BYTES_PER_MS
+        return f"{self.mark_prefix}:{self.sent_ms:.0f}"
+
+    def on_mark(self, name):
+        """
+        Handle a ``mark`` event echoed back by Twilio.
+
+        Returns:
+            bool: True if the mark belonged to this reply.
+        """
+        prefix, _, played = name.partition(":")
+        if prefix != self.mark_prefix:
+            return False
+        # Twilio echoes pending marks after a clear; those were never played
+        if not self.interrupted:
+            self.played_ms = max(self.played_ms, float(played))
+            self._mark_received.set()
+        return True
+
+    @property
+    def is_playing(self):
+        """
+        Whether the caller may still be hearing this reply.
+        """
+        if self.interrupted:
+            return False
+        return not self.generation_done or self.played_ms < self.sent_ms
+
+    async def wait_played(self, grace=Config.PLAYBACK_MARK_GRACE):
+        """
+        Wait until Twilio has played all the audio sent for this reply.
+
+        Twilio plays in real time, so if the last mark has not come back once
+        the unplayed audio plus ``grace`` seconds have passed, it never will;
+        the audio is then taken as heard.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.sent_ms - self.played_ms) / 1000 + grace
+        while self.played_ms < self.sent_ms:
+            self._mark_received.clear()
+            try:
+                await asyncio.wait_for(self._mark_received.wait(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                logging.warning("Twilio did not acknowledge the end of the reply; assuming it was played.")
+                self.played_ms = self.sent_ms
+
+    def interrupt(self):
+        """
+        Stop tracking playback; marks that arrive afterwards are ignored.
+        """
+        self.interrupted = True
+
+    def played_text(self):
+        """
+        Return the part of the reply the caller has heard.
+        """
+        if not self.interrupted and self.generation_done and self.played_ms >= self.sent_ms:
+            return self.text
+        if self.words:
+            return " ".join(word for word, end_ms in self.words if end_ms <= self.played_ms)
+        if not self.sent_ms:
+            return ""
+        words = self.text.split()
+        heard = int(len(words) * min(1.0, self.played_ms / self.sent_ms))
+        return " ".join(words[:heard])
@@ -0,0 +1,242 @@
+# voice_assistant/provider_router.py
+
+import asyncio
+import logging
+from collections import deque
+
+import numpy as np
+
+from voice_assistant.api_key_manager import lease_api_key
+from voice_assistant.config import Config
+from voice_assistant.executor import iterate_blocking
+from voice_assistant.metrics import Counter, provider_errors_total, registry
+from voice_assistant.response_generation import response_tokens
+from voice_assistant.session import count_tokens
+from voice_assistant.transcription import async_transcribe_audio
+
+hedged_requests_total = registry.register(Counter(
+    "voice_hedged_requests_total", "Second requests sent because the first was slow.", ("stage",)))
+failovers_total = registry.register(Counter(
+    "voice_provider_failovers_total", "Requests sent to the next provider because one failed.", ("stage",)))
+provider_wins_total = registry.register(Counter(
+    "voice_provider_wins_total", "Requests answered, by the provider that answered first.", ("stage", "provider")))
+
+
+class ProvidersUnavailable(Exception):
+    """
+    Raised when every provider in a chain failed.
+    """
+
+
+class ProviderRouter:
+    """
+    Sends one stage's requests down an ordered chain of providers.
+
+    The first provider gets every request. If it fails, the next one is
+    tried. If it is still running after the ``percentile`` of its recent
+    latencies, one hedged request goes to the next provider, and whichever
+    answers first wins; the other is cancelled. Hedging at p95 sends about
+    one extra request in twenty while cutting off the slowest tail.
+
+    Latency is timed from when an attempt has its API key, and a cancelled
+    attempt counts as taking as long as it ran, so slow requests that lost
+    a race still raise the percentile.
+    """
+
+    def __init__(self, stage, service, chain, percentile=Config.HEDGE_PERCENTILE):
+        self.stage = stage
+        self.service = service
+        self.chain = list(dict.fromkeys(chain))
+        self.percentile = percentile
+        self.latencies = {model: deque(maxlen=Config.HEDGE_WINDOW) for model in self.chain}
+
+    def hedge_delay(self, model):
+        """
+        Seconds to wait for ``model`` before hedging.
+        """
+        samples = self.latencies[model]
+        if len(samples) < Config.HEDGE_MIN_SAMPLES:
+            return Config.HEDGE_DEFAULT_DELAY
+        return max(Config.HEDGE_MIN_DELAY, float(np.percentile(samples, self.percentile)))
+
+    async def _attempt(self, attempt, model, tokens, started):
+        # The key is leased from the provider's pool for as long as the attempt runs
+        async with lease_api_key(self.service, model, tokens) as lease:
+            # Time spent waiting for a key is not the provider's latency
+            started.set_result(asyncio.get_running_loop().time())
+            return await attempt(model, lease)
+
+    def _record_latency(self, model, started, now):
+        if started.done() and not started.cancelled():
+            self.latencies[model].append(now - started.result())
+
+    async def race(self, attempt, discard=None, tokens=0):
+        """
+        Get one answer from the chain.
+
+        Args:
+            attempt (callable): ``attempt(model, lease)`` returns an awaitable of
+                the answer and raises on failure; ``lease.key`` is the API key to use.
+                The lease is released when the attempt returns, unless it calls
+                ``lease.keep()`` to hold it while its answer is consumed.
+            discard (callable, optional): Async cleanup for answers that arrived
+                too late to be used.
+            tokens (int): Estimated tokens of the request, for the key pools.
+
+        Returns:
+            The first answer.
+
+        Raises:
+            ProvidersUnavailable: If every provider failed.
+        """
+        loop = asyncio.get_running_loop()
+        remaining = iter(self.chain)
+        pending = {}  # task -> (model, future of the time its key was leased)
+        leftovers = []
+        hedged = False
+        last_error = None
+
+        def launch():
+            model = next(remaining, None)
+            if model is None:
+                return False
+            started = loop.create_future()
+            task = asyncio.create_task(self._attempt(attempt, model, tokens, started))
+            pending[task] = (model, started)
+            return True
+
+        launch()
+        try:
+            while pending:
+                waits = set(pending)
+                timeout = None
+                if not hedged and len(self.chain) > 1:
+                    model, started = next(iter(pending.values()))
+                    if started.done():
+                        timeout = max(0.0, started.result() + self.hedge_delay(model) - loop.time())
+                    else:
+                        # The hedge timer starts once the attempt has its key
+                        waits.add(started)
+                done, _ = await asyncio.wait(waits, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if launch():
+                        hedged_requests_total.inc(self.stage)
+                        logging.info(f"Hedging slow {model} {self.stage} request")
+                    continue
+                answers = []
+                for task in done & pending.keys():
+                    model, started = pending.pop(task)
+                    if task.exception() is None:
+                        answers.append((model, started, task.result()))
+                        continue
+                    last_error = task.exception()
+                    provider_errors_total.inc(self.stage, model)
+                    logging.warning(f"{model} {self.stage} request failed: {last_error}")
+                    if launch():
+                        failovers_total.inc(self.stage)
+                if answers:
+                    now = loop.time()
+                    for model, started, _ in answers:
+                        self._record_latency(model, started, now)
+                    model, _, answer = answers[0]
+                    leftovers = [late for _, _, late in answers[1:]]
+                    provider_wins_total.inc(self.stage, model)
+                    return answer
+        finally:
+            # A cancelled attempt took at least this long; leaving it out would pull the hedge delay down
+            now = loop.time()
+            for task, (model, started) in pending.items():
+                if task.done():
+                    # Finished while the race itself was being cancelled
+                    if not task.cancelled() and task.exception() is None:
+                        leftovers.append(task.result())
+                    continue
+                self._record_latency(model, started, now)
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if discard is not None:
+                for late in leftovers:
+                    await discard(late)
+        raise ProvidersUnavailable(f"Every {self.stage} provider failed") from last_error
+
+    def stats(self):
+        return {
+            "stage": self.stage,
+            "chain": self.chain,
+            "hedge_delay": {model: round(self.hedge_delay(model), 3) for model in self.chain},
+        }
+
+
+transcription_router = ProviderRouter("stt", "transcription", [Config.TRANSCRIPTION_MODEL] + Config.TRANSCRIPTION_FALLBACKS)
+response_router = ProviderRouter("llm", "response", [Config.RESPONSE_MODEL] + Config.RESPONSE_FALLBACKS)
+
+
+async def route_transcription(audio, sample_rate, call_limiter=None):
+    """
+    Transcribe audio with the first transcription provider that answers.
+
+    Returns:
+        str: The transcribed text.
+
+    Raises:
+        ProvidersUnavailable: If every provider failed.
+    """
+    async def attempt(model, lease):
+        return await async_transcribe_audio(model, lease.key, audio, sample_rate=sample_rate,
+                                            call_limiter=call_limiter)
+
+    return await transcription_router.race(attempt)
+
+
+async def route_response_stream(chat_history, max_tokens=None, call_limiter=None):
+    """
+    Stream a response from the first LLM provider to produce a token.
+
+    Providers race for the first token only; once the reply has started,
+    it comes from that provider, and a failure after that ends the reply
+    where it is.
+
+    Yields:
+        str: Pieces of the generated response text.
+
+    Raises:
+        ProvidersUnavailable: If every provider failed before its first token.
+    """
+    async def attempt(model, lease):
+        tokens = iterate_blocking(response_tokens, model, lease.key, chat_history, max_tokens,
+                                  call_limiter=call_limiter)
+        try:
+            first_token = await tokens.__anext__()
+        except StopAsyncIteration:
+            first_token = ""
+        except BaseException:
+            await tokens.aclose()
+            raise
+        # The request is in flight until the stream ends, so the key stays leased until then
+        lease.keep()
+        return model, first_token, tokens, lease
+
+    async def discard(answer):
+        _, _, tokens, lease = answer
+        await tokens.aclose()
+        lease.release()
+
+    estimate = sum(count_tokens(message["content"]) for message in chat_history) + (max_tokens or 0)
+    model, first_token, tokens, lease = await response_router.race(attempt, discard, tokens=estimate)
+    error = None
+    try:
+        yield first_token
+        async for token in tokens:
+            yield token
+    except Exception as e:
+        error = e
+        logging.error(f"Failed to stream response: {e}")
+        provider_errors_total.inc("llm", model)
+    finally:
+        await tokens.aclose()
+        lease.release(error)
+
+
+def router_stats():
+    return [transcription_router.stats(), response_router.stats()]
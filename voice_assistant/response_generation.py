@@ -1,15 +1,49 @@
 # voice_assistant/response_generation.py
 
 import logging
+from collections import namedtuple
 
-from openai import OpenAI
-from groq import Groq
-import ollama
-
+from voice_assistant.clients import get_client
 from voice_assistant.config import Config
+from voice_assistant.executor import iterate_blocking, run_blocking
+from voice_assistant.metrics import provider_errors_total
+from voice_assistant.text_chunker import sentence_ends
+
+
+# ``max_words`` is where the spoken reply should end (at the next sentence
+# boundary); ``max_tokens`` is the provider-side cap, with headroom so that
+# sentence can still be finished.
+ResponseBudget = namedtuple("ResponseBudget", ["max_words", "max_tokens"])
+
+
+def response_budget(response_length:int):
+    """
+    Map the UI's "Response Length" setting to a response budget.
+
+    Args:
+    response_length (int): The setting, 1 (shortest) to 5.
+
+    Returns:
+    ResponseBudget: The word and token budget for one reply.
+    """
+    max_words = response_length * Config.WORDS_PER_RESPONSE_LENGTH
+    max_tokens = int(max_words * Config.TOKENS_PER_WORD) + Config.RESPONSE_TOKEN_HEADROOM
+    return ResponseBudget(max_words, max_tokens)
 
 
-def generate_response(model:str, api_key:str, chat_history:list, local_model_path:str=None):
+def trim_to_sentence(text:str):
+    """
+    Drop an unfinished trailing sentence, e.g. one cut off by ``max_tokens``.
+
+    Text without any complete sentence is returned unchanged.
+    """
+    end = None
+    for end in sentence_ends(text):
+        pass
+    return text[:end].strip() if end is not None else text
+
+
+def generate_response(model:str, api_key:str, chat_history:list, local_model_path:str=None, max_tokens:int=None):
     """
     Generate a response using the specified model.
     
@@ -18,47 +52,208 @@ def generate_response(model:str, api_key:str, chat_history:list, local_model_pat
     api_key (str): The API key for the response generation service.
     chat_history (list): The chat history as a list of messages.
     local_model_path (str): The path to the local model (if applicable).
+    max_tokens (int): Provider-side cap on the reply length; the reply is
+        trimmed to its last complete sentence when set.
 
     Returns:
     str: The generated response text.
     """
     try:
-        if model == 'openai':
-            return _generate_openai_response(api_key, chat_history)
-        elif model == 'groq':
-            return _generate_groq_response(api_key, chat_history)
-        elif model == 'ollama':
-            return _generate_ollama_response(chat_history)
-        elif model == 'local':
-            # Placeholder for local LLM response generation
-            return "Generated response from local model"
-        else:
-            raise ValueError("Unsupported response generation model")
+        return _generate_response(model, api_key, chat_history, max_tokens)
     except Exception as e:
         logging.error(f"Failed to generate response: {e}")
+        provider_errors_total.inc("llm", model)
         return "Error in generating response"
 
-def _generate_openai_response(api_key, chat_history):
-    client = OpenAI(api_key=api_key)
+async def async_generate_response(model:str, api_key:str, chat_history:list, local_model_path:str=None,
+                                  max_tokens:int=None, call_limiter=None):
+    """
+    Generate a response on the shared worker pool without blocking the event loop.
+
+    Args:
+    model (str): The model to use for response generation ('openai', 'groq', 'local').
+    api_key (str): The API key for the response generation service.
+    chat_history (list): The chat history as a list of messages.
+    local_model_path (str): The path to the local model (if applicable).
+    max_tokens (int): Provider-side cap on the reply length.
+    call_limiter (CallLimiter, optional): Per-call concurrency limit.
+
+    Returns:
+    str: The generated response text.
+    """
+    return await run_blocking(generate_response, model, api_key, chat_history, local_model_path, max_tokens,
+                              call_limiter=call_limiter)
+
+def generate_response_stream(model:str, api_key:str, chat_history:list, max_tokens:int=None):
+    """
+    Generate a response using the specified model, yielding text as it is produced.
+
+    Args:
+    model (str): The model to use for response generation ('openai', 'groq', 'ollama').
+    api_key (str): The API key for the response generation service.
+    chat_history (list): The chat history as a list of messages.
+    max_tokens (int): Provider-side cap on the reply length.
+
+    Yields:
+    str: Pieces of the generated response text.
+    """
+    produced = False
+    try:
+        for token in response_tokens(model, api_key, chat_history, max_tokens):
+            produced = True
+            yield token
+    except Exception as e:
+        logging.error(f"Failed to stream response: {e}")
+        provider_errors_total.inc("llm", model)
+        if not produced:
+            yield "Error in generating response"
+
+async def async_generate_response_stream(model:str, api_key:str, chat_history:list, max_tokens:int=None,
+                                         call_limiter=None):
+    """
+    Stream a response on the shared worker pool without blocking the event loop.
+
+    Args:
+    model (str): The model to use for response generation ('openai', 'groq', 'ollama').
+    api_key (str): The API key for the response generation service.
+    chat_history (list): The chat history as a list of messages.
+    max_tokens (int): Provider-side cap on the reply length.
+    call_limiter (CallLimiter, optional): Per-call concurrency limit.
+
+    Yields:
+    str: Pieces of the generated response text.
+    """
+    async for token in iterate_blocking(generate_response_stream, model, api_key, chat_history, max_tokens,
+                                        call_limiter=call_limiter):
+        yield token
+
+def _generate_response(model, api_key, chat_history, max_tokens=None):
+    # Like generate_response, but provider errors are raised
+    if model == 'openai':
+        response = _generate_openai_response(api_key, chat_history, max_tokens)
+    elif model == 'groq':
+        response = _generate_groq_response(api_key, chat_history, max_tokens)
+    elif model == 'ollama':
+        response = _generate_ollama_response(chat_history, max_tokens)
+    elif model == 'local':
+        # Placeholder for local LLM response generation
+        return "Generated response from local model"
+    else:
+        raise ValueError("Unsupported response generation model")
+    return trim_to_sentence(response) if max_tokens else response
+
+
+def response_text(model:str, api_key:str, chat_history:list, max_tokens:int=None):
+    """
+    Generate a response from one provider, raising its errors instead of returning an error message.
+
+    Args:
+    model (str): The model to use for response generation ('openai', 'groq', 'ollama', 'local').
+    api_key (str): The API key for the response generation service.
+    chat_history (list): The chat history as a list of messages.
+    max_tokens (int): Provider-side cap on the reply length; the reply is
+        trimmed to its last complete sentence when set.
+
+    Returns:
+    str: The generated response text.
+    """
+    return _generate_response(model, api_key, chat_history, max_tokens)
+
+
+def response_tokens(model:str, api_key:str, chat_history:list, max_tokens:int=None):
+    """
+    Stream a response from one provider, raising its errors instead of speaking them.
+
+    Args:
+    model (str): The model to use for response generation ('openai', 'groq', 'ollama').
+    api_key (str): The API key for the response generation service.
+    chat_history (list): The chat history as a list of messages.
+    max_tokens (int): Provider-side cap on the reply length.
+
+    Returns:
+    Iterator[str]: Pieces of the generated response text.
+    """
+    if model == 'openai':
+        return _stream_openai_response(api_key, chat_history, max_tokens)
+    elif model == 'groq':
+        return _stream_groq_response(api_key, chat_history, max_tokens)
+    elif model == 'ollama':
+        return _stream_ollama_response(chat_history, max_tokens)
+    return _reply_in_one_piece(model, api_key, chat_history, max_tokens)
+
+
+def _reply_in_one_piece(model, api_key, chat_history, max_tokens=None):
+    # Backends without streaming support produce their reply in one piece
+    yield _generate_response(model, api_key, chat_history, max_tokens)
+
+
+def _completion_options(max_tokens):
+    return {"max_tokens": max_tokens} if max_tokens else {}
+
+
+def _generate_openai_response(api_key, chat_history, max_tokens=None):
+    client = get_client('openai', api_key)
     response = client.chat.completions.create(
         model=Config.OPENAI_LLM,
-        messages=chat_history
+        messages=chat_history,
+        **_completion_options(max_tokens)
     )
     return response.choices[0].message.content
 
 
-def _generate_groq_response(api_key, chat_history):
-    client = Groq(api_key=api_key)
+def _generate_groq_response(api_key, chat_history, max_tokens=None):
+    client = get_client('groq', api_key)
     response = client.chat.completions.create(
         model=Config.GROQ_LLM,
-        messages=chat_history
+        messages=chat_history,
+        **_completion_options(max_tokens)
     )
     return response.choices[0].message.content
 
 
-def _generate_ollama_response(chat_history):
-    response = ollama.chat(
+def _ollama_options(max_tokens):
+    return {"num_predict": max_tokens} if max_tokens else None
+
+
+def _generate_ollama_response(chat_history, max_tokens=None):
+    response = get_client('ollama').chat(
+        model=Config.OLLAMA_LLM,
+        messages=chat_history,
+        options=_ollama_options(max_tokens),
+    )
+    return response['message']['content']
+
+
+def _stream_chat_completion(client, llm, chat_history, max_tokens=None):
+    stream = client.chat.completions.create(
+        model=llm,
+        messages=chat_history,
+        stream=True,
+        **_completion_options(max_tokens)
+    )
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+
+def _stream_openai_response(api_key, chat_history, max_tokens=None):
+    return _stream_chat_completion(get_client('openai', api_key), Config.OPENAI_LLM, chat_history, max_tokens)
+
+
+def _stream_groq_response(api_key, chat_history, max_tokens=None):
+    return _stream_chat_completion(get_client('groq', api_key), Config.GROQ_LLM, chat_history, max_tokens)
+
+
+def _stream_ollama_response(chat_history, max_tokens=None):
+    stream = get_client('ollama').chat(
         model=Config.OLLAMA_LLM,
         messages=chat_history,
+        stream=True,
+        options=_ollama_options(max_tokens),
     )
-    return response['message']['content']
\ No newline at end of file
+    for chunk in stream:
+        if chunk['message']['content']:
+            yield chunk['message']['content']
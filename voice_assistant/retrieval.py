@@ -0,0 +1,190 @@
+# voice_assistant/retrieval.py
+
+import asyncio
+import logging
+from collections import OrderedDict
+
+from voice_assistant.config import Config
+from voice_assistant.executor import run_blocking
+from voice_assistant.metrics import Counter, registry
+
+retrievals_total = registry.register(Counter(
+    "voice_retrievals_total", "Knowledge base lookups of a turn, by outcome.", ("outcome",)))
+
+_knowledge_base = None
+
+
+def normalize_query(text):
+    """
+    Normalize a query for cache lookups: case and spacing do not change the passages.
+    """
+    return " ".join(text.split()).lower()
+
+
+class KnowledgeBase:
+    """
+    Retrieval over a FAISS vector store, sized for the call turn.
+
+    Query embeddings and search results are kept in small LRUs, and a
+    search for a query already in flight is shared rather than repeated.
+    ``retrieve`` never waits longer than its budget: when time runs out the
+    turn goes ahead without context, while the search finishes in the
+    background and fills the cache for the next time the query comes up.
+    """
+
+    def __init__(self, vectors, k=Config.PDF_RETRIEVER_K, budget=Config.RETRIEVAL_BUDGET,
+                 cache_size=Config.RETRIEVAL_CACHE_SIZE):
+        self.vectors = vectors
+        self.k = k
+        self.budget = budget
+        self.cache_size = cache_size
+        self.query_vectors = OrderedDict()
+        self.results = OrderedDict()
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    async def _search(self, query):
+        try:
+            vector = self.query_vectors.get(query)
+            if vector is None:
+                vector = await run_blocking(self.vectors.embeddings.embed_query, query)
+                self._remember(self.query_vectors, query, vector)
+            documents = await run_blocking(self.vectors.similarity_search_by_vector, vector, k=self.k)
+            passages = [document.page_content for document in documents]
+            self._remember(self.results, query, passages)
+            return passages
+        except Exception as e:
+            logging.error(f"Knowledge base search failed: {e}")
+            retrievals_total.inc("error")
+            return []
+        finally:
+            self.in_flight.pop(query, None)
+
+    def _start(self, query):
+        task = self.in_flight.get(query)
+        if task is None:
+            task = asyncio.create_task(self._search(query))
+            self.in_flight[query] = task
+        return task
+
+    def prefetch(self, text):
+        """
+        Start searching for text the caller has said, without waiting for the result.
+
+        Called with the transcript before the turn ends, so the search is
+        often done, or under way, by the time ``retrieve`` asks for it.
+        """
+        query = normalize_query(text)
+        if query and query not in self.results:
+            self._start(query)
+
+    async def retrieve(self, text, budget=None):
+        """
+        Return the passages relevant to the caller's words, within the time budget.
+
+        Args:
+            text (str): The transcript of the turn.
+            budget (float, optional): Seconds to wait; defaults to the knowledge base's budget.
+
+        Returns:
+            list: Passage texts, best first; empty if the budget ran out.
+        """
+        query = normalize_query(text)
+        if not query:
+            return []
+        passages = self.results.get(query)
+        if passages is not None:
+            self.results.move_to_end(query)
+            self.hits += 1
+            retrievals_total.inc("hit")
+            return passages
+        self.misses += 1
+        try:
+            # Shielded: a search that runs out of time still fills the cache
+            passages = await asyncio.wait_for(asyncio.shield(self._start(query)),
+                                              self.budget if budget is None else budget)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            retrievals_total.inc("timeout")
+            return []
+        retrievals_total.inc("miss")
+        return passages
+
+    def stats(self):
+        return {
+            "cached_queries": len(self.results),
+            "in_flight": len(self.in_flight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "timeouts": self.timeouts,
+        }
+
+
+def context_message(passages):
+    """
+    Build the system message that hands retrieved passages to the LLM.
+    """
+    excerpts = "\n\n".join(passages)
+    return {"role": "system", "content": f"Relevant excerpts from the knowledge base:\n\n{excerpts}"}
+
+
+def get_knowledge_base():
+    """
+    Return the process-wide knowledge base, or None if none is configured.
+    """
+    return _knowledge_base
+
+
+def build_knowledge_base(pdf_paths=Config.KNOWLEDGE_BASE_PDFS):
+    """
+    Ingest the configured PDFs and save their index, unless it is saved already.
+
+    Run once, before the server workers start, so they only load the index.
+
+    Args:
+        pdf_paths (list): Paths of the PDF files; nothing is built if empty.
+    """
+    if not pdf_paths:
+        return
+    from pdf_processing import ingest_corpus
+
+    ingest_corpus(pdf_paths)
+
+
+async def load_knowledge_base(pdf_paths=Config.KNOWLEDGE_BASE_PDFS):
+    """
+    Load the saved index of the configured PDFs, off the event loop.
+
+    The index is never built here: every server worker runs this at
+    startup, and building it in each would repeat the parsing and the
+    embedding requests. ``build_knowledge_base`` (or ``pdf_processing.py``)
+    builds it beforehand.
+
+    Args:
+        pdf_paths (list): Paths of the PDF files; nothing is loaded if empty.
+
+    Returns:
+        KnowledgeBase | None: The knowledge base the call turns use.
+    """
+    global _knowledge_base
+    if not pdf_paths:
+        return None
+    # Imported here so the server only needs FAISS and LangChain when a knowledge base is configured
+    from pdf_processing import load_corpus
+
+    vectors = await asyncio.get_running_loop().run_in_executor(None, load_corpus, pdf_paths)
+    if vectors is None:
+        logging.warning("The knowledge base has not been indexed; answering without it. "
+                        "Index it with: python pdf_processing.py " + " ".join(pdf_paths))
+        return None
+    _knowledge_base = KnowledgeBase(vectors)
+    logging.info(f"Knowledge base ready: {len(pdf_paths)} files")
+    return _knowledge_base
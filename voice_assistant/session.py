@@ -0,0 +1,209 @@
+# voice_assistant/session.py
+
+import asyncio
+import logging
+import time
+
+from voice_assistant.api_key_manager import lease_api_key
+from voice_assistant.config import Config
+from voice_assistant.executor import run_blocking
+from voice_assistant.metrics import provider_errors_total
+from voice_assistant.response_generation import response_text
+
+# Rough per-message overhead of the chat format, in tokens
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def count_tokens(text):
+    """
+    Estimate the number of LLM tokens in a piece of text.
+    """
+    return int(len(text.split()) * Config.TOKENS_PER_WORD) + _MESSAGE_OVERHEAD_TOKENS
+
+
+class Turn:
+    """
+    One message of a call's conversation.
+    """
+
+    __slots__ = ("role", "content", "tokens", "created_at")
+
+    def __init__(self, role, content):
+        self.role = role
+        self.content = content
+        self.tokens = count_tokens(content)
+        self.created_at = time.time()
+
+    def as_message(self):
+        return {"role": self.role, "content": self.content}
+
+
+class CallSession:
+    """
+    Conversation state of one call, keyed by its Twilio ``streamSid``.
+
+    Prompts include the newest turns that fit in ``context_tokens``. Turns
+    that slide out of that window are summarized in the background and then
+    dropped, so both the prompt and the memory held per call stay bounded no
+    matter how long the call runs.
+    """
+
+    def __init__(self, stream_sid, context_tokens=Config.SESSION_CONTEXT_TOKENS,
+                 summary_batch_tokens=Config.SESSION_SUMMARY_BATCH_TOKENS):
+        self.stream_sid = stream_sid
+        self.context_tokens = context_tokens
+        self.summary_batch_tokens = summary_batch_tokens
+        self.turns = []
+        self.summary = ""
+        self.summarized_turns = 0
+        self.started_at = time.time()
+        self._summary_task = None
+
+    def add_turn(self, role, content):
+        """
+        Append a turn to the conversation.
+
+        Args:
+            role (str): 'user' or 'assistant'.
+            content (str): The message text.
+
+        Returns:
+            Turn: The new turn, which can be updated later with ``update_turn``.
+        """
+        turn = Turn(role, content)
+        self.turns.append(turn)
+        return turn
+
+    def update_turn(self, turn, content):
+        """
+        Replace a turn's text, e.g. with the part of a reply the caller heard.
+        """
+        turn.content = content
+        turn.tokens = count_tokens(content)
+        self._maybe_summarize()
+
+    def discard_turns(self, *turns):
+        """
+        Remove turns that should not be part of the conversation after all.
+        """
+        self.turns = [turn for turn in self.turns if turn not in turns]
+
+    def prompt(self, system_prompt):
+        """
+        Build the chat messages for the next LLM request.
+
+        Args:
+            system_prompt (str): The system prompt.
+
+        Returns:
+            list: System prompt, summary of earlier turns, then the recent turns.
+        """
+        messages = []
+        budget = self.context_tokens
+        for turn in reversed(self.turns):
+            if not turn.content:
+                continue
+            if turn.tokens > budget and messages:
+                break
+            budget -= turn.tokens
+            messages.append(turn.as_message())
+        messages.reverse()
+
+        preamble = [{"role": "system", "content": system_prompt}]
+        if self.summary:
+            preamble.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        return preamble + messages
+
+    def history(self):
+        """
+        Return the turns still held in memory as chat messages.
+        """
+        return [turn.as_message() for turn in self.turns if turn.content]
+
+    def stats(self):
+        """
+        Describe the session for inspection.
+        """
+        return {
+            "stream_sid": self.stream_sid,
+            "age_seconds": round(time.time() - self.started_at, 1),
+            "turns": len(self.turns),
+            "turn_tokens": sum(turn.tokens for turn in self.turns),
+            "summarized_turns": self.summarized_turns,
+            "summary_tokens": count_tokens(self.summary) if self.summary else 0,
+            "summarizing": self._summary_task is not None and not self._summary_task.done(),
+        }
+
+    def _overflow(self):
+        # Turns (oldest first) that no longer fit in the context window
+        budget = self.context_tokens
+        for index in range(len(self.turns) - 1, -1, -1):
+            budget -= self.turns[index].tokens
+            if budget < 0:
+                return self.turns[:index + 1]
+        return []
+
+    def _maybe_summarize(self):
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+        overflow = self._overflow()
+        if sum(turn.tokens for turn in overflow) < self.summary_batch_tokens:
+            return
+        self._summary_task = asyncio.create_task(self._summarize(overflow))
+
+    async def _summarize(self, overflow):
+        transcript = "\n".join(f"{turn.role}: {turn.content}" for turn in overflow if turn.content)
+        request = [
+            {"role": "system", "content": "Summarize this phone conversation in a few sentences. "
+                                          "Keep names, facts, requests and decisions."},
+            {"role": "user", "content": f"Earlier summary: {self.summary or '(none)'}\n\n{transcript}"},
+        ]
+        estimate = sum(count_tokens(message["content"]) for message in request) + Config.SESSION_SUMMARY_MAX_TOKENS
+        try:
+            async with lease_api_key("response", Config.RESPONSE_MODEL, estimate) as lease:
+                self.summary = await run_blocking(response_text, Config.RESPONSE_MODEL, lease.key, request,
+                                                  Config.SESSION_SUMMARY_MAX_TOKENS)
+        except Exception as e:
+            # Keep memory bounded even without a summary; the old turns are lost
+            provider_errors_total.inc("llm", Config.RESPONSE_MODEL)
+            logging.warning(f"Failed to summarize session {self.stream_sid}; dropping {len(overflow)} turns: {e}")
+        self.summarized_turns += len(overflow)
+        self.discard_turns(*overflow)
+
+    def close(self):
+        """
+        Stop background work for the session.
+        """
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+
+
+class SessionRegistry:
+    """
+    The live call sessions of this process, keyed by ``streamSid``.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+
+    def create(self, stream_sid):
+        session = CallSession(stream_sid)
+        self.sessions[stream_sid] = session
+        return session
+
+    def get(self, stream_sid):
+        return self.sessions.get(stream_sid)
+
+    def remove(self, stream_sid):
+        session = self.sessions.pop(stream_sid, None)
+        if session is not None:
+            session.close()
+
+    def stats(self):
+        """
+        Describe every live session.
+        """
+        return [session.stats() for session in list(self.sessions.values())]
+
+
+sessions = SessionRegistry()
@@ -0,0 +1,190 @@
+# voice_assistant/session_store.py
+
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from voice_assistant.config import Config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    stream_sid TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    worker INTEGER
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stream_sid TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    worker INTEGER
+);
+CREATE INDEX IF NOT EXISTS messages_by_call ON messages (stream_sid, id);
+CREATE TABLE IF NOT EXISTS call_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stream_sid TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    worker INTEGER
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def default_settings():
+    """
+    Return the settings used until the UI changes them.
+    """
+    return {"system_prompt": Config.SYSTEM_PROMPT, "response_length": Config.RESPONSE_LENGTH}
+
+
+class SessionStore:
+    """
+    Call transcripts and UI settings shared between processes.
+
+    The voice server workers write calls and their messages, and the
+    Streamlit UI reads them and writes the settings. Everything lives in one
+    SQLite database in WAL mode, so readers never block the writers. In the
+    server, queries go through ``submit``, which runs them on one thread per
+    process instead of on the event loop.
+    """
+
+    def __init__(self, path=Config.SESSION_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._writer = None
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def submit(self, func, *args):
+        """
+        Run one of the store's methods off the event loop.
+
+        The query is queued right away; await the returned future for its
+        result, or leave it to finish in the background.
+
+        Args:
+            func (callable): The method to run, e.g. ``store.add_message``.
+            *args: Its arguments.
+
+        Returns:
+            asyncio.Future: Resolves to the method's return value.
+        """
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-store")
+        return asyncio.get_running_loop().run_in_executor(self._writer, functools.partial(func, *args))
+
+    def start_call(self, stream_sid):
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO calls (stream_sid, started_at, ended_at, worker) VALUES (?, ?, NULL, ?)",
+            (stream_sid, time.time(), os.getpid()))
+        self._add_call_event(connection, stream_sid, "started")
+
+    def end_call(self, stream_sid):
+        connection = self._connection()
+        connection.execute("UPDATE calls SET ended_at = ? WHERE stream_sid = ?", (time.time(), stream_sid))
+        self._add_call_event(connection, stream_sid, "ended")
+
+    def _add_call_event(self, connection, stream_sid, kind):
+        # Other workers follow calls by this table's id, which only grows in commit order
+        connection.execute("INSERT INTO call_events (stream_sid, kind, worker) VALUES (?, ?, ?)",
+                           (stream_sid, kind, os.getpid()))
+
+    def add_message(self, stream_sid, role, content):
+        self._connection().execute(
+            "INSERT INTO messages (stream_sid, role, content, created_at, worker) VALUES (?, ?, ?, ?, ?)",
+            (stream_sid, role, content, time.time(), os.getpid()))
+
+    def list_calls(self, limit=20):
+        """
+        Return the most recent calls, newest first.
+
+        Returns:
+            list: Dicts with ``stream_sid``, ``started_at`` and ``ended_at`` (None while live).
+        """
+        rows = self._connection().execute(
+            "SELECT stream_sid, started_at, ended_at FROM calls ORDER BY started_at DESC LIMIT ?", (limit,))
+        return [{"stream_sid": sid, "started_at": started, "ended_at": ended} for sid, started, ended in rows]
+
+    def messages(self, stream_sid):
+        """
+        Return a call's messages in order.
+
+        Returns:
+            list: Chat messages with ``role`` and ``content``.
+        """
+        rows = self._connection().execute(
+            "SELECT role, content FROM messages WHERE stream_sid = ? ORDER BY id", (stream_sid,))
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def last_ids(self):
+        """
+        Return the newest call event id and message id, the cursors of ``changes_since``.
+        """
+        connection = self._connection()
+        call_event_id = connection.execute("SELECT MAX(id) FROM call_events").fetchone()[0]
+        message_id = connection.execute("SELECT MAX(id) FROM messages").fetchone()[0]
+        return call_event_id or 0, message_id or 0
+
+    def changes_since(self, after_call_event_id, after_message_id, exclude_worker=None):
+        """
+        Return what other processes have written since an earlier poll.
+
+        Both cursors are autoincrement ids rather than timestamps, so a row
+        committed late by another process is never skipped.
+
+        Args:
+            after_call_event_id (int): Call starts and ends with a larger id are returned.
+            after_message_id (int): Messages with a larger id are returned.
+            exclude_worker (int, optional): Skip rows written by this process.
+
+        Returns:
+            tuple: (call events, messages), each a list of dicts in write order.
+        """
+        connection = self._connection()
+        call_events = connection.execute(
+            "SELECT id, stream_sid, kind, worker FROM call_events "
+            "WHERE id > ? AND worker IS NOT ? ORDER BY id",
+            (after_call_event_id, exclude_worker))
+        messages = connection.execute(
+            "SELECT id, stream_sid, role, content, worker FROM messages "
+            "WHERE id > ? AND worker IS NOT ? ORDER BY id",
+            (after_message_id, exclude_worker))
+        return (
+            [{"id": event_id, "stream_sid": sid, "kind": kind, "worker": worker}
+             for event_id, sid, kind, worker in call_events],
+            [{"id": message_id, "stream_sid": sid, "role": role, "content": content, "worker": worker}
+             for message_id, sid, role, content, worker in messages],
+        )
+
+    def get_settings(self):
+        """
+        Return the current settings, falling back to the defaults.
+        """
+        settings = default_settings()
+        for key, value in self._connection().execute("SELECT key, value FROM settings"):
+            settings[key] = json.loads(value)
+        return settings
+
+    def set_settings(self, **settings):
+        self._connection().executemany(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            [(key, json.dumps(value)) for key, value in settings.items()])
@@ -0,0 +1,184 @@
+# voice_assistant/streaming_transcription.py
+
+import asyncio
+import json
+import logging
+from collections import namedtuple
+from urllib.parse import urlencode
+
+import websockets
+
+from voice_assistant.codec import TWILIO_SAMPLE_RATE
+from voice_assistant.config import Config
+from voice_assistant.metrics import provider_errors_total
+
+# ``is_final``: Deepgram will not revise this text any more.
+# ``speech_final``: Deepgram's own endpointing saw the end of the utterance.
+TranscriptEvent = namedtuple("TranscriptEvent", ["text", "is_final", "speech_final"])
+
+
+class DeepgramLiveTranscriber:
+    """
+    One live Deepgram connection per call, fed with the call's mu-law frames.
+
+    Interim and final results are passed to ``on_transcript`` as they arrive.
+    Final segments are collected until ``take_utterance`` hands them over as
+    the text of the turn that just ended.
+    """
+
+    def __init__(self, api_key, url=Config.DEEPGRAM_LIVE_URL, on_transcript=None):
+        self.api_key = api_key
+        self.url = url
+        self.on_transcript = on_transcript
+        self.ws = None
+        self.reader = None
+        self.final_segments = []
+        self.pending_interim = False
+        self._updated = asyncio.Event()
+
+    @property
+    def is_open(self):
+        return self.reader is not None and not self.reader.done()
+
+    async def start(self):
+        """
+        Open the live connection.
+        """
+        params = urlencode({
+            "model": Config.DEEPGRAM_LIVE_MODEL,
+            "encoding": "mulaw",
+            "sample_rate": TWILIO_SAMPLE_RATE,
+            "channels": 1,
+            "interim_results": "true",
+            "endpointing": Config.DEEPGRAM_LIVE_ENDPOINTING_MS,
+            "smart_format": "true",
+        })
+        # Deepgram accepts the API key as a WebSocket subprotocol
+        self.ws = await websockets.connect(f"{self.url}?{params}", subprotocols=["token", self.api_key])
+        self.reader = asyncio.create_task(self._read())
+        logging.info("✅ Connected to live transcription WebSocket.")
+
+    async def send_audio(self, ulaw_bytes):
+        """
+        Send one inbound frame of mu-law audio.
+
+        Args:
+            ulaw_bytes (bytes): The raw mu-law audio.
+        """
+        if not self.is_open:
+            return
+        try:
+            await self.ws.send(ulaw_bytes)
+        except websockets.ConnectionClosed:
+            # The reader notices too; turns fall back to batch transcription
+            pass
+
+    async def take_utterance(self, timeout=Config.STREAMING_STT_FINAL_TIMEOUT):
+        """
+        Return the final text of the turn that just ended and start a new one.
+
+        If Deepgram is still refining the last words, wait up to ``timeout``
+        seconds for them to become final.
+
+        Args:
+            timeout (float): How long to wait for outstanding interim results.
+
+        Returns:
+            str: The transcript, empty if nothing final was recognized.
+        """
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self.pending_interim and self.is_open:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            self._updated.clear()
+            try:
+                await asyncio.wait_for(self._updated.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        text = self.final_text()
+        self.final_segments = []
+        return text
+
+    def final_text(self):
+        """
+        Return the final text of the current turn so far.
+        """
+        return " ".join(self.final_segments).strip()
+
+    def restore(self, text):
+        """
+        Put back the text of a turn that was cancelled before it was answered,
+        so it is included in the next ``take_utterance``.
+        """
+        if text:
+            self.final_segments.insert(0, text)
+
+    async def _read(self):
+        try:
+            async for message in self.ws:
+                data = json.loads(message)
+                if data.get("type") != "Results":
+                    continue
+                alternatives = data.get("channel", {}).get("alternatives") or [{}]
+                event = TranscriptEvent(
+                    text=alternatives[0].get("transcript", ""),
+                    is_final=data.get("is_final", False),
+                    speech_final=data.get("speech_final", False),
+                )
+                if event.is_final:
+                    if event.text:
+                        self.final_segments.append(event.text)
+                    self.pending_interim = False
+                elif event.text:
+                    self.pending_interim = True
+                self._updated.set()
+                if self.on_transcript is not None and event.text:
+                    self.on_transcript(event)
+        except websockets.ConnectionClosed as e:
+            logging.warning(f"⚠️ Live transcription WebSocket closed: {e}")
+        except Exception as e:
+            logging.error(f"❌ Live transcription reader failed: {e}")
+            provider_errors_total.inc("stt", "deepgram_live")
+        finally:
+            self.pending_interim = False
+            self._updated.set()
+
+    async def close(self):
+        """
+        Flush outstanding audio and close the connection.
+        """
+        if self.ws is None:
+            return
+        try:
+            if self.is_open:
+                await self.ws.send(json.dumps({"type": "CloseStream"}))
+        finally:
+            await self.ws.close()
+            if self.reader is not None:
+                await asyncio.gather(self.reader, return_exceptions=True)
+
+
+async def open_live_transcriber(model, api_key, on_transcript=None):
+    """
+    Open a streaming transcriber for the given model, if it supports one.
+
+    Args:
+        model (str): The configured streaming transcription model ('deepgram' or None).
+        api_key (str): The API key for the transcription service.
+        on_transcript (callable, optional): Called with every TranscriptEvent.
+
+    Returns:
+        DeepgramLiveTranscriber | None: The open transcriber, or None when streaming
+        is disabled or the connection failed and batch transcription should be used.
+    """
+    if model != 'deepgram':
+        return None
+    transcriber = DeepgramLiveTranscriber(api_key, on_transcript=on_transcript)
+    try:
+        await transcriber.start()
+    except Exception as e:
+        logging.error(f"❌ Failed to open live transcription, using batch transcription: {e}")
+        provider_errors_total.inc("stt", "deepgram_live")
+        return None
+    return transcriber
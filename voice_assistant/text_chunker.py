@@ -0,0 +1,152 @@
+# voice_assistant/text_chunker.py
+
+import re
+
+from voice_assistant.config import Config
+
+# A sentence ends at . ! or ? followed by whitespace; a clause at , ; or :
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s")
+_CLAUSE_END = re.compile(r"[,;:]\s")
+# The end of a stream only needs the terminator
+_TEXT_END = re.compile(r"[.!?][\"')\]]*$")
+# Words whose period does not end a sentence
+_ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "approx", "dept", "fig",
+                  "inc", "ltd", "e.g", "i.e", "a.m", "p.m", "u.s"}
+
+
+def _is_abbreviation(text, terminator):
+    if text[terminator] != ".":
+        return False
+    words = text[:terminator].split()
+    return bool(words) and words[-1].lstrip("\"'([").lower() in _ABBREVIATIONS
+
+
+def sentence_ends(text):
+    """
+    Yield the position just after each sentence boundary in ``text``.
+
+    A boundary is . ! or ? (with any closing quotes or brackets) followed by
+    whitespace, so the period of "$3.50" is not one, nor the period of an
+    abbreviation such as "a.m." or "Dr.". The end of ``text`` counts as whitespace.
+    """
+    for match in _SENTENCE_END.finditer(text + " "):
+        if not _is_abbreviation(text, match.start()):
+            yield min(match.end(), len(text))
+
+
+def ends_sentence(text):
+    """
+    Whether ``text`` ends at a sentence boundary.
+    """
+    match = _TEXT_END.search(text)
+    return match is not None and not _is_abbreviation(text, match.start())
+
+
+class SentenceChunker:
+    """
+    Groups streamed LLM tokens into sentence- or clause-sized pieces for TTS.
+
+    Sentences are emitted as soon as they are complete. Until the first chunk
+    has gone out, a long enough clause is emitted on its own as well, so the
+    caller starts hearing the reply as early as possible.
+
+    With a ``word_budget`` the chunker is ``exhausted`` at the first sentence
+    boundary after the budget is reached, so the reply never ends mid-sentence.
+    """
+
+    def __init__(self, min_clause_chars=Config.TTS_MIN_CLAUSE_CHARS,
+                 max_chunk_chars=Config.TTS_MAX_CHUNK_CHARS, word_budget=None):
+        self.min_clause_chars = min_clause_chars
+        self.max_chunk_chars = max_chunk_chars
+        self.word_budget = word_budget
+        self.buffer = ""
+        self.chunks_emitted = 0
+        self.words_emitted = 0
+        self.exhausted = False
+
+    def feed(self, token):
+        """
+        Add a token and return any chunks that are now complete.
+
+        Args:
+            token (str): The next piece of generated text.
+
+        Returns:
+            list: The completed chunks, in order.
+        """
+        self.buffer += token
+        chunks = []
+        while not self.exhausted:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            chunk, self.buffer = self.buffer[:cut].strip(), self.buffer[cut:].lstrip()
+            if chunk:
+                chunks.append(chunk)
+                self._count(chunk)
+        return chunks
+
+    def flush(self):
+        """
+        Return whatever text is left once the token stream has ended.
+
+        Returns:
+            list: The final chunk, if any text remains.
+        """
+        chunk, self.buffer = self.buffer.strip(), ""
+        if not chunk or self.exhausted:
+            return []
+        if self.word_budget and self.chunks_emitted and not _TEXT_END.search(chunk):
+            # Most likely cut off by the provider's token cap; don't speak half a sentence
+            return []
+        self._count(chunk)
+        return [chunk]
+
+    def _count(self, chunk):
+        self.chunks_emitted += 1
+        self.words_emitted += len(chunk.split())
+        if self.word_budget and self.words_emitted >= self.word_budget and ends_sentence(chunk):
+            self.exhausted = True
+
+    def _find_cut(self):
+        for match in _SENTENCE_END.finditer(self.buffer):
+            if not _is_abbreviation(self.buffer, match.start()):
+                return match.end()
+        if self.chunks_emitted == 0:
+            for match in _CLAUSE_END.finditer(self.buffer):
+                if match.end() >= self.min_clause_chars:
+                    return match.end()
+        if len(self.buffer) >= self.max_chunk_chars:
+            # No punctuation in sight; break at the last word boundary instead
+            space = self.buffer.rfind(" ", 0, self.max_chunk_chars)
+            return space + 1 if space > 0 else self.max_chunk_chars
+        return None
+
+
+async def chunk_text_stream(tokens, chunker=None):
+    """
+    Turn an async stream of tokens into an async stream of speakable chunks.
+
+    Once the chunker's word budget is used up the token stream is closed, so
+    the provider stops generating text that would never be spoken.
+
+    Args:
+        tokens (AsyncIterable[str]): The streamed LLM output.
+        chunker (SentenceChunker, optional): The chunker to use.
+
+    Yields:
+        str: Sentence- or clause-sized text chunks.
+    """
+    chunker = chunker or SentenceChunker()
+    try:
+        async for token in tokens:
+            for chunk in chunker.feed(token):
+                yield chunk
+            if chunker.exhausted:
+                return
+        for chunk in chunker.flush():
+            yield chunk
+    finally:
+        aclose = getattr(tokens, "aclose", None)
+        if aclose is not None:
+            await aclose()
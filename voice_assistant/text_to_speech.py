@@ -1,85 +1,319 @@
 import asyncio
-import websockets
+import base64
 import json
 import logging
 import os
-import uuid
 from dotenv import load_dotenv
 
+from voice_assistant.codec import TWILIO_FRAME_BYTES, iter_frames
+from voice_assistant.config import Config
+from voice_assistant.metrics import (TTS_REQUEST_SENT, TTS_FIRST_BYTE, FIRST_FRAME_SENT, LAST_FRAME_SENT,
+                                     provider_errors_total)
+from voice_assistant.tts_cache import TTSCache, cache_key
+from voice_assistant.tts_pool import CartesiaConnectionPool
+
 # Load environment variables from the .env file
 load_dotenv()
 
-# Cartesia TTS WebSocket URL
+# Cartesia TTS WebSocket URLs, one per API key; override them to point at a stand-in server
 CARTESIA_API_KEY = os.getenv("CARTESIA_API_KEY")
-CARTESIA_TTS_WEBSOCKET_URL = (
-    f"wss://api.cartesia.ai/tts/websocket?api_key={CARTESIA_API_KEY}"
-    "&cartesia_version=2024-06-10"
-)
+CARTESIA_TTS_WEBSOCKET_URL = os.getenv("CARTESIA_TTS_WEBSOCKET_URL")
+CARTESIA_TTS_WEBSOCKET_URLS = [CARTESIA_TTS_WEBSOCKET_URL] if CARTESIA_TTS_WEBSOCKET_URL else [
+    f"wss://api.cartesia.ai/tts/websocket?api_key={api_key}&cartesia_version=2024-06-10"
+    for api_key in Config.API_KEYS["cartesia"] or [CARTESIA_API_KEY]
+]
+CARTESIA_MODEL_ID = "sonic"
+CARTESIA_VOICE_ID = "156fb8d2-335b-4950-9cb3-a2d33befec77"
+
+_tts_pool = None
+_tts_cache = TTSCache()
 
-async def text_to_speech(text: str, twilio_websocket, streamSid: str):
+
+def get_tts_pool():
     """
-    Convert text to speech using Cartesia TTS WebSocket and stream the audio to Twilio WebSocket.
+    Return the process-wide pool of Cartesia TTS WebSockets.
+    """
+    global _tts_pool
+    if _tts_pool is None:
+        _tts_pool = CartesiaConnectionPool(CARTESIA_TTS_WEBSOCKET_URLS)
+    return _tts_pool
+
+
+def get_tts_cache():
+    """
+    Return the process-wide cache of synthesized phrases.
+    """
+    return _tts_cache
+
+
+def _tts_request(text: str, continue_: bool = None, add_timestamps: bool = False):
+    """
+    Build a Cartesia generation request.
+
+    ``continue_`` is only set for streamed input: True while more text will
+    follow in the same context, False to close it. ``add_timestamps`` asks for
+    word timings, which playback tracking uses to tell which words were heard.
+    """
+    request = {
+        "model_id": CARTESIA_MODEL_ID,
+        "transcript": text,
+        "voice": {
+            "mode": "id",
+            "id": CARTESIA_VOICE_ID
+        },
+        "output_format": {
+            "container": "raw",
+            "encoding": "pcm_mulaw",
+            "sample_rate": 8000
+        }
+    }
+    if continue_ is not None:
+        request["continue"] = continue_
+    if add_timestamps:
+        request["add_timestamps"] = True
+    return request
+
+
+async def _forward_audio(tts_context, twilio_websocket, streamSid: str, playback=None, audio_out=None, timer=None):
+    """
+    Forward audio frames from a Cartesia TTS context to Twilio until generation is done.
     This version mimics the JS flow by forwarding the received payload as-is.
+    With a PlaybackTracker, each frame is followed by a Twilio mark. With an
+    ``audio_out`` bytearray, the decoded audio is collected for the cache.
+    With a TurnTimer, the first audio received and sent are marked on it.
+
+    Returns:
+        bool: True if Cartesia finished the generation without an error.
+    """
+    # Word timestamps are relative to the context, which may start after cached audio
+    timestamp_offset_ms = playback.sent_ms if playback is not None else 0.0
+    async for data in tts_context:
+        # logging.info(f"📜 Received metadata from Cartesia: {data}")
+
+        if "error" in data:
+            logging.error(f"❌ Cartesia API Error: {data['error']}")
+            provider_errors_total.inc("tts", "cartesia")
+            return False
+
+        if data.get("done", False):
+            logging.info("✅ TTS generation complete.")
+            return True
+
+        if playback is not None and "word_timestamps" in data:
+            playback.add_word_timestamps(data["word_timestamps"], timestamp_offset_ms)
+
+        if "data" in data:
+            payload = data["data"]  # Expecting a Base64 string
+            if timer is not None:
+                timer.mark(TTS_FIRST_BYTE)
+            if audio_out is not None:
+                audio_out += base64.b64decode(payload)
+            if not streamSid:
+                # logging.error("❌ streamSid is missing. Cannot send audio to Twilio.")
+                continue
+
+            try:
+                # Use send_text (FastAPI WebSocket method) instead of send()
+                await twilio_websocket.send_text(json.dumps({
+                    "event": "media",
+                    "streamSid": streamSid,
+                    "media": {
+                        "payload": payload
+                    }
+                }))
+                if timer is not None:
+                    timer.mark(FIRST_FRAME_SENT)
+                if playback is not None:
+                    await twilio_websocket.send_text(json.dumps({
+                        "event": "mark",
+                        "streamSid": streamSid,
+                        "mark": {
+                            "name": playback.audio_sent(payload)
+                        }
+                    }))
+                # logging.info("🎵 Forwarded audio chunk to Twilio.")
+            except Exception as e:
+                logging.error(f"❌ Failed to forward audio chunk: {e}")
+
+
+async def _send_cached_audio(audio, twilio_websocket, streamSid: str, playback=None, text="", timer=None):
     """
-    logging.info("🔗 Connecting to Cartesia TTS WebSocket...")
-    async with websockets.connect(CARTESIA_TTS_WEBSOCKET_URL) as tts_ws:
-        logging.info("✅ Connected to Cartesia TTS WebSocket.")
-
-        context_id = f"context_{uuid.uuid4().hex}"
-        tts_request = {
-            "model_id": "sonic",
-            "transcript": text,
-            "voice": {
-                "mode": "id",
-                "id": "156fb8d2-335b-4950-9cb3-a2d33befec77"
-            },
-            "context_id": context_id,
-            "output_format": {
-                "container": "raw",
-                "encoding": "pcm_mulaw",
-                "sample_rate": 8000
+    Stream cached mu-law audio to Twilio in 20 ms frames, with no provider round trip.
+    """
+    if not streamSid:
+        return
+    start_ms = playback.sent_ms if playback is not None else 0.0
+    frame_count = -(-len(audio) // TWILIO_FRAME_BYTES)
+    for index, frame in enumerate(iter_frames(audio)):
+        payload = base64.b64encode(frame).decode("ascii")
+        await twilio_websocket.send_text(json.dumps({
+            "event": "media",
+            "streamSid": streamSid,
+            "media": {
+                "payload": payload
             }
-        }
+        }))
+        if timer is not None:
+            timer.mark(FIRST_FRAME_SENT)
+        if playback is None:
+            continue
+        mark = playback.audio_sent(payload)
+        last_frame = index + 1 == frame_count
+        if last_frame or (index + 1) % Config.TTS_CACHE_MARK_FRAMES == 0:
+            await twilio_websocket.send_text(json.dumps({
+                "event": "mark",
+                "streamSid": streamSid,
+                "mark": {
+                    "name": mark
+                }
+            }))
+    if playback is not None:
+        playback.add_untimed_words(text, start_ms, playback.sent_ms)
+
+
+async def _synthesize(text: str):
+    """
+    Synthesize a phrase without playing it.
+
+    Returns:
+        bytes | None: The mu-law audio, or None if generation failed.
+    """
+    tts_context = await get_tts_pool().open_context()
+    try:
+        await tts_context.send(_tts_request(text))
+        audio = bytearray()
+        async for data in tts_context:
+            if "error" in data:
+                logging.error(f"❌ Cartesia API Error: {data['error']}")
+                return None
+            if data.get("done", False):
+                return bytes(audio)
+            if "data" in data:
+                audio += base64.b64decode(data["data"])
+    finally:
+        tts_context.release()
+
+
+async def prewarm_tts_cache(phrases):
+    """
+    Synthesize phrases into the cache ahead of the first call.
+
+    Args:
+        phrases (list): The phrases to cache.
+    """
+    for text in phrases:
+        key = cache_key(CARTESIA_VOICE_ID, CARTESIA_MODEL_ID, text)
+        if _tts_cache.get(key) is not None:
+            continue
+        try:
+            audio = await _synthesize(text)
+        except Exception as e:
+            logging.warning(f"Failed to pre-warm TTS cache for '{text}': {e}")
+            continue
+        if audio:
+            _tts_cache.put(key, audio)
+    logging.info(f"TTS cache pre-warmed: {_tts_cache.stats()}")
+
 
-        await tts_ws.send(json.dumps(tts_request))
+async def text_to_speech(text: str, twilio_websocket, streamSid: str, playback=None, timer=None):
+    """
+    Convert text to speech using Cartesia TTS WebSocket and stream the audio to Twilio WebSocket.
+    Short phrases are served from the TTS cache when possible.
+    Cancelling the coroutine also cancels the generation on Cartesia's side.
+    A TurnTimer, if given, is marked as the audio is requested and sent.
+    """
+    if playback is not None:
+        playback.add_text(text)
+
+    key = None
+    if _tts_cache.cacheable(text):
+        key = cache_key(CARTESIA_VOICE_ID, CARTESIA_MODEL_ID, text)
+        audio = _tts_cache.get(key)
+        if audio is not None:
+            logging.info(f"🗣️ Playing cached audio for: {text}")
+            try:
+                await _send_cached_audio(audio, twilio_websocket, streamSid, playback, text, timer)
+                if timer is not None:
+                    timer.mark(LAST_FRAME_SENT)
+            finally:
+                if playback is not None:
+                    playback.generation_done = True
+            return
+
+    tts_context = await get_tts_pool().open_context()
+    try:
+        await tts_context.send(_tts_request(text, add_timestamps=playback is not None))
         logging.info(f"🗣️ Sent text to TTS WebSocket: {text}")
+        if timer is not None:
+            timer.mark(TTS_REQUEST_SENT)
 
-        async for message in tts_ws:
-            if isinstance(message, str):
-                try:
-                    data = json.loads(message)
-                except Exception as e:
-                    logging.error(f"Error parsing TTS message: {e}")
-                    continue
+        audio_out = bytearray() if key is not None else None
+        if await _forward_audio(tts_context, twilio_websocket, streamSid, playback, audio_out, timer) and audio_out:
+            _tts_cache.put(key, bytes(audio_out))
+        if timer is not None:
+            timer.mark(LAST_FRAME_SENT)
+        logging.info("🔚 TTS streaming completed.")
+    except asyncio.CancelledError:
+        await tts_context.cancel()
+        raise
+    finally:
+        if playback is not None:
+            playback.generation_done = True
+        tts_context.release()
 
-                # logging.info(f"📜 Received metadata from Cartesia: {data}")
-
-                if "error" in data:
-                    logging.error(f"❌ Cartesia API Error: {data['error']}")
-                    break
-
-                if data.get("done", False):
-                    logging.info("✅ TTS generation complete.")
-                    break
-
-                if "data" in data:
-                    payload = data["data"]  # Expecting a Base64 string
-                    if not streamSid:
-                        # logging.error("❌ streamSid is missing. Cannot send audio to Twilio.")
-                        continue
-
-                    try:
-                        # Use send_text (FastAPI WebSocket method) instead of send()
-                        await twilio_websocket.send_text(json.dumps({
-                            "event": "media",
-                            "streamSid": streamSid,
-                            "media": {
-                                "payload": payload
-                            }
-                        }))
-                        # logging.info("🎵 Forwarded audio chunk to Twilio.")
-                    except Exception as e:
-                        logging.error(f"❌ Failed to forward audio chunk: {e}")
-            else:
-                logging.warning("⚠️ Received non-text message from TTS WebSocket.")
+
+async def stream_text_to_speech(text_chunks, twilio_websocket, streamSid: str, playback=None, timer=None):
+    """
+    Speak text that arrives in pieces, streaming the audio to Twilio as it is synthesized.
+
+    Every chunk is pushed into the same Cartesia context as soon as it is
+    available, while audio for the earlier chunks is already being forwarded.
+    Leading chunks found in the TTS cache are played from it; once one chunk
+    has gone to Cartesia, the rest follow it there to keep the audio in order.
+
+    Args:
+        text_chunks (AsyncIterable[str]): Sentence- or clause-sized pieces of the reply.
+        twilio_websocket: The Twilio media stream WebSocket.
+        streamSid (str): The Twilio stream to send the audio to.
+        playback (PlaybackTracker, optional): Tracks what the caller has heard.
+        timer (TurnTimer, optional): Marked as the audio is requested and sent.
+    """
+    tts_context = None
+    forwarder = None
+    add_timestamps = playback is not None
+    try:
+        async for chunk in text_chunks:
+            if playback is not None:
+                playback.add_text(chunk)
+            if tts_context is None and _tts_cache.cacheable(chunk):
+                audio = _tts_cache.get(cache_key(CARTESIA_VOICE_ID, CARTESIA_MODEL_ID, chunk))
+                if audio is not None:
+                    logging.info(f"🗣️ Playing cached audio for: {chunk}")
+                    await _send_cached_audio(audio, twilio_websocket, streamSid, playback, chunk, timer)
+                    continue
+            if tts_context is None:
+                tts_context = await get_tts_pool().open_context()
+                forwarder = asyncio.create_task(_forward_audio(tts_context, twilio_websocket, streamSid, playback,
+                                                               timer=timer))
+            # Cartesia concatenates continued transcripts as-is
+            await tts_context.send(_tts_request(chunk + " ", continue_=True, add_timestamps=add_timestamps))
+            logging.info(f"🗣️ Sent text chunk to TTS WebSocket: {chunk}")
+            if timer is not None:
+                timer.mark(TTS_REQUEST_SENT)
+        if tts_context is not None:
+            await tts_context.send(_tts_request("", continue_=False, add_timestamps=add_timestamps))
+            await forwarder
+        if timer is not None:
+            timer.mark(LAST_FRAME_SENT)
         logging.info("🔚 TTS streaming completed.")
+    except asyncio.CancelledError:
+        if tts_context is not None:
+            await tts_context.cancel()
+        raise
+    finally:
+        if forwarder is not None:
+            forwarder.cancel()
+        if playback is not None:
+            playback.generation_done = True
+        if tts_context is not None:
+            tts_context.release()
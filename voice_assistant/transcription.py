@@ -1,53 +1,84 @@
 # voice_assistant/transcription.py
 
+import io
 import json
 import logging
-import requests
+import os
 import time
 
 from colorama import Fore, init
-from openai import OpenAI
-from groq import Groq
-from deepgram import DeepgramClient,PrerecordedOptions,FileSource
+from deepgram import PrerecordedOptions,FileSource
 
-fast_url = "http://localhost:8000"
-checked_fastwhisperapi = False
+from voice_assistant.clients import get_client
+from voice_assistant.codec import TWILIO_SAMPLE_RATE, pcm16_to_wav, wav_header
+from voice_assistant.executor import run_blocking
+from voice_assistant.local_services import MultipartUpload, fastwhisper
+
+# FastWhisperAPI transcription options
+FASTWHISPER_OPTIONS = {
+    'model': "base",
+    'language': "en",
+    'vad_filter': True,
+}
+FASTWHISPER_HEADERS = {'Authorization': 'Bearer dummy_api_key'}
 
 def check_fastwhisperapi():
-    """Check if the FastWhisper API is running."""
-    global checked_fastwhisperapi, fast_url
-    if not checked_fastwhisperapi:
-        infopoint = f"{fast_url}/info"
-        try:
-            response = requests.get(infopoint)
-            if response.status_code != 200:
-                raise Exception("FastWhisperAPI is not running")
-        except Exception:
-            raise Exception("FastWhisperAPI is not running")
-        checked_fastwhisperapi = True
-
-def transcribe_audio(model, api_key, audio_file_path, local_model_path=None):
+    """Check if the FastWhisper API is running; the result is cached for a while."""
+    fastwhisper.check()
+
+def _load_audio(audio, sample_rate):
+    """
+    Turn a path or an in-memory buffer into a (filename, bytes) upload.
+
+    Raw PCM buffers (anything without a RIFF header) are taken to be mono
+    16-bit samples at ``sample_rate`` and framed as WAV.
     """
-    Transcribe an audio file using the specified model.
+    if isinstance(audio, str):
+        with open(audio, "rb") as audio_file:
+            return os.path.basename(audio), audio_file.read()
+    if isinstance(audio, io.IOBase):
+        audio = audio.getbuffer() if isinstance(audio, io.BytesIO) else audio.read()
+    data = memoryview(audio).cast("B")
+    if data[:4] == b"RIFF":
+        return "audio.wav", data.tobytes()
+    return "audio.wav", pcm16_to_wav(data, sample_rate)
+
+def _fastwhisper_upload(audio, sample_rate):
+    # Raw PCM goes out behind its WAV header without being joined to it
+    if isinstance(audio, (str, io.IOBase)) and not isinstance(audio, io.BytesIO):
+        filename, data = _load_audio(audio, sample_rate)
+        chunks = [data]
+    else:
+        data = memoryview(audio.getbuffer() if isinstance(audio, io.BytesIO) else audio).cast("B")
+        filename = "audio.wav"
+        chunks = [data] if data[:4] == b"RIFF" else [wav_header(data.nbytes, sample_rate), data]
+    return MultipartUpload(FASTWHISPER_OPTIONS, "file", filename, "audio/wav", chunks)
+
+def transcribe_audio(model, api_key, audio, local_model_path=None, sample_rate=TWILIO_SAMPLE_RATE):
+    """
+    Transcribe audio using the specified model.
     
     Args:
         model (str): The model to use for transcription ('openai', 'groq', 'deepgram', 'fastwhisper', 'local').
         api_key (str): The API key for the transcription service.
-        audio_file_path (str): The path to the audio file to transcribe.
+        audio (str | bytes | memoryview | BytesIO | np.ndarray): The path to an audio file,
+            or in-memory WAV or raw 16-bit mono PCM.
         local_model_path (str): The path to the local model (if applicable).
+        sample_rate (int): The sample rate of raw PCM input.
 
     Returns:
         str: The transcribed text.
     """
     try:
+        if model == 'fastwhisperapi':
+            return _transcribe_with_fastwhisperapi(_fastwhisper_upload(audio, sample_rate))
+        upload = _load_audio(audio, sample_rate)
         if model == 'openai':
-            return _transcribe_with_openai(api_key, audio_file_path)
+            return _transcribe_with_openai(api_key, upload)
         elif model == 'groq':
-            return _transcribe_with_groq(api_key, audio_file_path)
+            return _transcribe_with_groq(api_key, upload)
         elif model == 'deepgram':
-            return _transcribe_with_deepgram(api_key, audio_file_path)
-        elif model == 'fastwhisperapi':
-            return _transcribe_with_fastwhisperapi(audio_file_path)
+            return _transcribe_with_deepgram(api_key, upload)
         elif model == 'local':
             # Placeholder for local STT model transcription
             return "Transcribed text from local model"
@@ -57,35 +88,57 @@ def transcribe_audio(model, api_key, audio_file_path, local_model_path=None):
         logging.error(f"{Fore.RED}Failed to transcribe audio: {e}{Fore.RESET}")
         raise Exception("Error in transcribing audio")
 
-def _transcribe_with_openai(api_key, audio_file_path):
-    client = OpenAI(api_key=api_key)
-    with open(audio_file_path, "rb") as audio_file:
-        transcription = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file,
-            language='en'
-        )
+async def async_transcribe_audio(model, api_key, audio, local_model_path=None, sample_rate=TWILIO_SAMPLE_RATE,
+                                 call_limiter=None):
+    """
+    Transcribe audio on the shared worker pool without blocking the event loop.
+
+    Args:
+        model (str): The model to use for transcription.
+        api_key (str): The API key for the transcription service.
+        audio (str | bytes | memoryview | BytesIO | np.ndarray): The path to an audio file,
+            or in-memory WAV or raw 16-bit mono PCM.
+        local_model_path (str): The path to the local model (if applicable).
+        sample_rate (int): The sample rate of raw PCM input.
+        call_limiter (CallLimiter, optional): Per-call concurrency limit.
+
+    Returns:
+        str: The transcribed text.
+    """
+    if model == 'fastwhisperapi':
+        # A localhost HTTP call; await it on the event loop instead of holding a worker thread
+        try:
+            return await _async_transcribe_with_fastwhisperapi(_fastwhisper_upload(audio, sample_rate))
+        except Exception as e:
+            logging.error(f"{Fore.RED}Failed to transcribe audio: {e}{Fore.RESET}")
+            raise Exception("Error in transcribing audio")
+    return await run_blocking(transcribe_audio, model, api_key, audio, local_model_path, sample_rate,
+                              call_limiter=call_limiter)
+
+def _transcribe_with_openai(api_key, upload):
+    client = get_client('openai', api_key)
+    transcription = client.audio.transcriptions.create(
+        model="whisper-1",
+        file=upload,
+        language='en'
+    )
     return transcription.text
 
 
-def _transcribe_with_groq(api_key, audio_file_path):
-    client = Groq(api_key=api_key)
-    with open(audio_file_path, "rb") as audio_file:
-        transcription = client.audio.transcriptions.create(
-            model="whisper-large-v3",
-            file=audio_file,
-            language='en'
-        )
+def _transcribe_with_groq(api_key, upload):
+    client = get_client('groq', api_key)
+    transcription = client.audio.transcriptions.create(
+        model="whisper-large-v3",
+        file=upload,
+        language='en'
+    )
     return transcription.text
 
 
-def _transcribe_with_deepgram(api_key, audio_file_path):
-    deepgram = DeepgramClient(api_key)
+def _transcribe_with_deepgram(api_key, upload):
+    deepgram = get_client('deepgram', api_key)
     try:
-        with open(audio_file_path, "rb") as file:
-            buffer_data = file.read()
-
-        payload = {"buffer": buffer_data}
+        payload = {"buffer": upload[1]}
         options = PrerecordedOptions(model="nova-2", smart_format=True)
         response = deepgram.listen.prerecorded.v("1").transcribe_file(payload, options)
         data = json.loads(response.to_json())
@@ -97,19 +150,17 @@ def _transcribe_with_deepgram(api_key, audio_file_path):
         raise
 
 
-def _transcribe_with_fastwhisperapi(audio_file_path):
+def _transcribe_with_fastwhisperapi(upload):
     check_fastwhisperapi()
-    endpoint = f"{fast_url}/v1/transcriptions"
-
-    files = {'file': (audio_file_path, open(audio_file_path, 'rb'))}
-    data = {
-        'model': "base",
-        'language': "en",
-        'initial_prompt': None,
-        'vad_filter': True,
-    }
-    headers = {'Authorization': 'Bearer dummy_api_key'}
-
-    response = requests.post(endpoint, files=files, data=data, headers=headers)
-    response_json = response.json()
-    return response_json.get('text', 'No text found in the response.')
\ No newline at end of file
+    response = fastwhisper.client().post("/v1/transcriptions", content=upload.iter_chunks(),
+                                         headers={**FASTWHISPER_HEADERS, **upload.headers})
+    response.raise_for_status()
+    return response.json().get('text', 'No text found in the response.')
+
+
+async def _async_transcribe_with_fastwhisperapi(upload):
+    await fastwhisper.async_check()
+    response = await fastwhisper.async_client().post("/v1/transcriptions", content=upload.aiter_chunks(),
+                                                     headers={**FASTWHISPER_HEADERS, **upload.headers})
+    response.raise_for_status()
+    return response.json().get('text', 'No text found in the response.')
@@ -0,0 +1,142 @@
+# voice_assistant/tts_cache.py
+
+import hashlib
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+from voice_assistant.config import Config
+
+
+def normalize_text(text):
+    """
+    Normalize text for cache lookups: case and spacing do not change the audio.
+    """
+    return " ".join(text.split()).lower()
+
+
+def cache_key(voice_id, model_id, text):
+    """
+    Build the cache key for a synthesized phrase.
+
+    Args:
+        voice_id (str): The TTS voice.
+        model_id (str): The TTS model.
+        text (str): The phrase; it is normalized here.
+
+    Returns:
+        str: A hex digest identifying the audio.
+    """
+    raw = "\0".join((voice_id, model_id, normalize_text(text)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Bounded cache of synthesized mu-law 8 kHz audio.
+
+    Entries live in an in-memory LRU capped by total bytes. With a ``disk_dir``
+    every entry is also written to disk, and entries that were evicted from
+    memory (or written by an earlier run) are loaded back by memory-mapping
+    the file instead of copying it into the heap.
+    """
+
+    def __init__(self, max_bytes=Config.TTS_CACHE_MAX_BYTES, disk_dir=Config.TTS_CACHE_DIR,
+                 max_text_chars=Config.TTS_CACHE_MAX_TEXT_CHARS):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_text_chars = max_text_chars
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def cacheable(self, text):
+        """
+        Whether a phrase is short enough to be worth caching.
+        """
+        return 0 < len(text) <= self.max_text_chars
+
+    def get(self, key):
+        """
+        Look up cached audio.
+
+        Args:
+            key (str): The key from ``cache_key``.
+
+        Returns:
+            bytes | memoryview | None: The mu-law audio, or None on a miss.
+        """
+        with self._lock:
+            audio = self.entries.get(key)
+            if audio is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return audio
+        audio = self._load(key)
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, audio)
+        return audio
+
+    def put(self, key, audio):
+        """
+        Store synthesized audio.
+
+        Args:
+            key (str): The key from ``cache_key``.
+            audio (bytes): The mu-law audio.
+        """
+        if not audio or len(audio) > self.max_bytes:
+            return
+        with self._lock:
+            self._remember(key, audio)
+        if self.disk_dir:
+            path = self._path(key)
+            try:
+                # Write then rename so readers never map a partial file
+                with open(f"{path}.tmp", "wb") as cache_file:
+                    cache_file.write(audio)
+                os.replace(f"{path}.tmp", path)
+            except OSError as e:
+                logging.warning(f"Failed to write TTS cache entry {key}: {e}")
+
+    def stats(self):
+        """
+        Describe the cache contents and hit rate.
+
+        Returns:
+            dict: Entry count, bytes held in memory, hits and misses.
+        """
+        return {"entries": len(self.entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+    def _remember(self, key, audio):
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self.entries[key] = audio
+        self.size += len(audio)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.ulaw")
+
+    def _load(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as cache_file:
+                return memoryview(mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ))
+        except (FileNotFoundError, ValueError):
+            # ValueError: mmap of an empty file
+            return None
@@ -0,0 +1,219 @@
+# voice_assistant/tts_pool.py
+
+import asyncio
+import json
+import logging
+import uuid
+
+import websockets
+
+from voice_assistant.config import Config
+
+# Delivered to every open context when its connection drops
+_CONNECTION_LOST = {"error": "Cartesia TTS WebSocket connection lost"}
+
+
+class TTSContext:
+    """
+    One Cartesia generation context multiplexed over a pooled WebSocket.
+
+    Messages for the context are routed into its own queue by the connection's
+    reader, so any number of contexts can share a socket.
+    """
+
+    def __init__(self, connection, context_id):
+        self.connection = connection
+        self.context_id = context_id
+        self.queue = asyncio.Queue()
+
+    async def send(self, request):
+        """
+        Send a generation request for this context.
+
+        Args:
+            request (dict): The Cartesia request; its ``context_id`` is set here.
+        """
+        request["context_id"] = self.context_id
+        await self.connection.send(request)
+
+    async def cancel(self):
+        """
+        Ask Cartesia to stop generating audio for this context.
+        """
+        try:
+            await self.connection.send({"context_id": self.context_id, "cancel": True})
+        except Exception as e:
+            logging.warning(f"Failed to cancel TTS context {self.context_id}: {e}")
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.queue.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    def release(self):
+        """
+        Detach the context from its connection; later messages for it are dropped.
+        """
+        self.connection.contexts.pop(self.context_id, None)
+        self.queue.put_nowait(None)
+
+
+class _PooledConnection:
+    """
+    A long-lived Cartesia WebSocket with a reader task that demultiplexes by context.
+    """
+
+    def __init__(self, url, index):
+        self.url = url
+        self.index = index
+        self.ws = None
+        self.contexts = {}
+        self.reader = None
+        self.reconnects = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_open(self):
+        return self.ws is not None and self.reader is not None and not self.reader.done()
+
+    async def ensure_open(self):
+        async with self._lock:
+            if self.is_open:
+                return
+            delay = 0.5
+            for attempt in range(Config.CARTESIA_CONNECT_ATTEMPTS):
+                try:
+                    self.ws = await websockets.connect(self.url)
+                    break
+                except Exception as e:
+                    logging.error(f"❌ Failed to connect Cartesia TTS WebSocket #{self.index}: {e}")
+                    if attempt == Config.CARTESIA_CONNECT_ATTEMPTS - 1:
+                        raise
+                    await asyncio.sleep(delay)
+                    delay *= 2
+            if self.reader is not None:
+                self.reconnects += 1
+            self.reader = asyncio.create_task(self._read())
+            logging.info(f"✅ Connected Cartesia TTS WebSocket #{self.index}.")
+
+    async def send(self, request):
+        await self.ensure_open()
+        await self.ws.send(json.dumps(request))
+
+    async def _read(self):
+        try:
+            async for message in self.ws:
+                if not isinstance(message, str):
+                    logging.warning("⚠️ Received non-text message from TTS WebSocket.")
+                    continue
+                try:
+                    data = json.loads(message)
+                except Exception as e:
+                    logging.error(f"Error parsing TTS message: {e}")
+                    continue
+                context = self.contexts.get(data.get("context_id"))
+                if context is not None:
+                    context.queue.put_nowait(data)
+        except websockets.ConnectionClosed as e:
+            logging.warning(f"⚠️ Cartesia TTS WebSocket #{self.index} closed: {e}")
+        except Exception as e:
+            logging.error(f"❌ Cartesia TTS WebSocket #{self.index} reader failed: {e}")
+        finally:
+            # Fail the in-flight contexts; the next send reconnects
+            for context in list(self.contexts.values()):
+                context.queue.put_nowait(_CONNECTION_LOST)
+            self.contexts.clear()
+
+    async def check_health(self, timeout):
+        if not self.is_open:
+            return
+        try:
+            pong = await self.ws.ping()
+            await asyncio.wait_for(pong, timeout)
+        except Exception as e:
+            logging.warning(f"⚠️ Cartesia TTS WebSocket #{self.index} failed health check: {e}")
+            await self.close()
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+        if self.reader is not None:
+            await asyncio.gather(self.reader, return_exceptions=True)
+
+
+class CartesiaConnectionPool:
+    """
+    Process-wide pool of long-lived Cartesia TTS WebSockets.
+
+    Utterances from every call share a fixed number of sockets by opening
+    separate contexts on the least busy one. Dropped sockets are reopened on
+    the next send, and a background task pings idle sockets so dead ones are
+    noticed before a caller is waiting on them. Given several URLs (one per
+    API key), the sockets are spread evenly over them.
+    """
+
+    def __init__(self, url, size=Config.CARTESIA_POOL_SIZE,
+                 health_check_interval=Config.CARTESIA_HEALTH_CHECK_INTERVAL):
+        urls = [url] if isinstance(url, str) else list(url)
+        size = max(size, len(urls))
+        self.connections = [_PooledConnection(urls[index % len(urls)], index) for index in range(size)]
+        self.health_check_interval = health_check_interval
+        self._health_task = None
+
+    async def start(self):
+        """
+        Open every pooled connection and start the health checks.
+        """
+        # Connections that fail here are retried on first use
+        await asyncio.gather(*(connection.ensure_open() for connection in self.connections),
+                             return_exceptions=True)
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._check_health())
+
+    async def open_context(self):
+        """
+        Open a new context on the least busy connection.
+
+        Returns:
+            TTSContext: The context to send requests on and read messages from.
+        """
+        connection = min(self.connections, key=lambda c: (not c.is_open, len(c.contexts)))
+        await connection.ensure_open()
+        context = TTSContext(connection, f"context_{uuid.uuid4().hex}")
+        connection.contexts[context.context_id] = context
+        return context
+
+    def stats(self):
+        """
+        Describe the pooled connections.
+
+        Returns:
+            list: One dict per connection with its state, active contexts and reconnects.
+        """
+        return [{
+            "index": connection.index,
+            "open": connection.is_open,
+            "active_contexts": len(connection.contexts),
+            "reconnects": connection.reconnects,
+        } for connection in self.connections]
+
+    async def _check_health(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await asyncio.gather(*(
+                connection.check_health(self.health_check_interval)
+                for connection in self.connections
+            ))
+
+    async def close(self):
+        """
+        Stop the health checks and close every pooled connection.
+        """
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        await asyncio.gather(*(connection.close() for connection in self.connections))
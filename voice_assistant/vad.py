@@ -0,0 +1,136 @@
+# voice_assistant/vad.py
+
+from collections import namedtuple
+
+import numpy as np
+
+from voice_assistant.codec import TWILIO_SAMPLE_RATE
+from voice_assistant.config import Config
+
+SPEECH_START = "speech_start"
+SPEECH_END = "speech_end"
+
+# ``start`` and ``end`` are absolute sample positions in the call's audio;
+# ``end`` is None for SPEECH_START events.
+VADEvent = namedtuple("VADEvent", ["kind", "start", "end"])
+
+
+def frame_energy_db(frames):
+    """
+    Compute the mean energy of each PCM frame in decibels.
+
+    Args:
+        frames (np.ndarray): int16 array shaped (n_frames, frame_length).
+
+    Returns:
+        np.ndarray: float32 array of per-frame energies in dB.
+    """
+    samples = frames.astype(np.float32)
+    energy = np.einsum("ij,ij->i", samples, samples) / frames.shape[1]
+    return 10.0 * np.log10(energy + 1.0)
+
+
+class StreamingVAD:
+    """
+    Incremental energy-based voice activity detector for one call.
+
+    Audio is consumed in fixed frames (20 ms by default). Frame energies are
+    computed in one vectorized pass per chunk and compared against a running
+    noise floor, so there is no separate calibration step: the floor starts
+    at the absolute minimum, adapts while the caller is silent and is frozen
+    while they speak.
+    """
+
+    def __init__(self, sample_rate=TWILIO_SAMPLE_RATE,
+                 frame_ms=Config.VAD_FRAME_MS,
+                 threshold_db=Config.VAD_THRESHOLD_DB,
+                 min_energy_db=Config.VAD_MIN_ENERGY_DB,
+                 min_speech_ms=Config.VAD_MIN_SPEECH_MS,
+                 hangover_ms=Config.VAD_HANGOVER_MS,
+                 end_of_utterance_ms=Config.VAD_END_OF_UTTERANCE_MS,
+                 preroll_ms=Config.VAD_PREROLL_MS,
+                 max_speech_ms=Config.MAX_UTTERANCE_SECONDS * 1000,
+                 noise_adapt_rate=Config.VAD_NOISE_ADAPT_RATE):
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.threshold_db = threshold_db
+        self.min_energy_db = min_energy_db
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.hangover_samples = int(sample_rate * hangover_ms / 1000)
+        self.end_of_utterance_frames = max(1, end_of_utterance_ms // frame_ms)
+        self.preroll_samples = int(sample_rate * preroll_ms / 1000)
+        self.max_speech_samples = int(sample_rate * max_speech_ms / 1000) - self.frame_length
+        self.noise_adapt_rate = noise_adapt_rate
+
+        # Start where only the absolute minimum applies; seeding from the first
+        # frame would make a caller who speaks at once the noise floor
+        self.noise_floor_db = min_energy_db - threshold_db
+        self.in_speech = False
+        self.voiced_run = 0
+        self.silent_run = 0
+        self.speech_start = 0
+        self.last_voiced_end = 0
+        self.position = 0
+        self._pending = np.zeros(0, dtype=np.int16)
+
+    def process(self, pcm):
+        """
+        Feed PCM samples and return the speech events they complete.
+
+        Args:
+            pcm (np.ndarray): int16 samples of any length; partial frames are
+                carried over to the next call.
+
+        Returns:
+            list: VADEvent tuples, in order.
+        """
+        if len(self._pending):
+            pcm = np.concatenate((self._pending, pcm))
+        n_frames = len(pcm) // self.frame_length
+        usable = n_frames * self.frame_length
+        self._pending = pcm[usable:].copy()
+        if not n_frames:
+            return []
+
+        energies = frame_energy_db(pcm[:usable].reshape(n_frames, self.frame_length))
+
+        events = []
+        for energy in energies.tolist():
+            frame_start = self.position
+            self.position += self.frame_length
+            voiced = (energy >= self.min_energy_db
+                      and energy >= self.noise_floor_db + self.threshold_db)
+
+            if not self.in_speech:
+                if voiced:
+                    self.voiced_run += 1
+                    if self.voiced_run == 1:
+                        self.speech_start = frame_start
+                    if self.voiced_run >= self.min_speech_frames:
+                        self.in_speech = True
+                        self.silent_run = 0
+                        self.last_voiced_end = self.position
+                        self.speech_start = max(0, self.speech_start - self.preroll_samples)
+                        events.append(VADEvent(SPEECH_START, self.speech_start, None))
+                else:
+                    self.voiced_run = 0
+                    # Track drops in the floor quickly and rises slowly
+                    rate = 0.5 if energy < self.noise_floor_db else self.noise_adapt_rate
+                    self.noise_floor_db += rate * (energy - self.noise_floor_db)
+                continue
+
+            if voiced:
+                self.silent_run = 0
+                self.last_voiced_end = self.position
+            else:
+                self.silent_run += 1
+
+            too_long = self.position - self.speech_start >= self.max_speech_samples
+            if self.silent_run >= self.end_of_utterance_frames or too_long:
+                end = min(self.position, self.last_voiced_end + self.hangover_samples)
+                events.append(VADEvent(SPEECH_END, self.speech_start, end))
+                self.in_speech = False
+                self.voiced_run = 0
+                if too_long:
+                    # A level that never drops back is a new noise floor, not speech
+                    self.noise_floor_db = energy
+        return events